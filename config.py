@@ -24,3 +24,34 @@ class Config:
     
     # Configurações de CORS
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
+    
+    # Configurações do escalonador entre usuários
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'True').lower() == 'true'
+    SCHEDULER_MAX_WORKERS = int(os.environ.get('SCHEDULER_MAX_WORKERS', 16))
+    TENANT_MAX_CONCURRENCY = int(os.environ.get('TENANT_MAX_CONCURRENCY', 4))
+    TENANT_RATE_LIMIT = float(os.environ.get('TENANT_RATE_LIMIT', 10))
+    TENANT_BURST = float(os.environ.get('TENANT_BURST', 20))
+    TENANT_MAX_QUEUE = int(os.environ.get('TENANT_MAX_QUEUE', 32))
+    TENANT_MAX_WAIT = float(os.environ.get('TENANT_MAX_WAIT', 10))
+    TENANT_WEIGHTS = os.environ.get('TENANT_WEIGHTS', '')
+    TENANT_USAGE_TTL = float(os.environ.get('TENANT_USAGE_TTL', 3600))
+    
+    # Configurações de tracing e diagnóstico
+    TRACING_ENABLED = os.environ.get('TRACING_ENABLED', 'False').lower() == 'true'
+    TRACING_SAMPLE_RATE = float(os.environ.get('TRACING_SAMPLE_RATE', 1.0))
+    SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', 1000))
+    TRACING_BUFFER_SIZE = int(os.environ.get('TRACING_BUFFER_SIZE', 100))
+    DEBUG_API_TOKEN = os.environ.get('DEBUG_API_TOKEN', '')
+    
+    # Configurações de serialização
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    
+    # Configurações das operações em lote
+    BULK_CONCURRENCY = int(os.environ.get('BULK_CONCURRENCY', 8))
+    TELEGRAM_RATE_LIMIT = float(os.environ.get('TELEGRAM_RATE_LIMIT', 25))
+    TELEGRAM_FLOOD_RETRIES = int(os.environ.get('TELEGRAM_FLOOD_RETRIES', 3))
+    BULK_MAX_CHATS = int(os.environ.get('BULK_MAX_CHATS', 500))
+    
+    # Configurações dos anúncios fixados
+    ANNOUNCEMENT_DEBOUNCE_SECONDS = float(os.environ.get('ANNOUNCEMENT_DEBOUNCE_SECONDS', 2))
+    ANNOUNCEMENT_MAX_DELAY_SECONDS = float(os.environ.get('ANNOUNCEMENT_MAX_DELAY_SECONDS', 10))
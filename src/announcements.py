@@ -0,0 +1,235 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Announcement:
+    """Estado de um anúncio fixado em vários grupos"""
+
+    def __init__(self, user_id: str, key: str):
+        self.user_id = user_id
+        self.key = key
+        self.text: Optional[str] = None
+        self.parse_mode = 'HTML'
+        self.pin = True
+        self.group_ids: List[str] = []
+        self.messages: Dict[str, int] = {}  # group_id -> message_id publicado
+        self.sent_text: Dict[str, str] = {}  # group_id -> último texto publicado
+        self.pending = False
+        self.removed = False
+        self.first_pending_at = 0.0
+        self.timer: Optional[threading.Timer] = None
+        self.retries = 0  # publicações seguidas com falha em algum grupo
+        self.flush_lock = threading.Lock()
+        self.updates = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.sent = 0
+        self.edited = 0
+        self.failed = 0
+        self.last_flush_at: Optional[float] = None
+        self.last_results: List[Dict[str, Any]] = []
+
+
+class AnnouncementPublisher:
+    """
+    Anúncios fixados atualizados por edição da mensagem.
+
+    A primeira publicação envia e fixa a mensagem em cada grupo; as
+    seguintes editam a mesma mensagem. Atualizações em sequência são
+    agrupadas: só o conteúdo mais recente é publicado, depois de
+    debounce segundos sem novas atualizações (ou no máximo max_delay
+    segundos após a primeira atualização pendente). Grupos que falham
+    são publicados de novo com espera exponencial.
+    """
+
+    # Espera antes de republicar nos grupos que falharam (segundos)
+    RETRY_BASE_DELAY = 1.0
+    RETRY_MAX_DELAY = 60.0
+    # Publicações seguidas com falha até desistir (até a próxima atualização)
+    RETRY_LIMIT = 8
+
+    def __init__(self, bot_manager, debounce: float = 2.0, max_delay: float = 10.0):
+        self.bot_manager = bot_manager
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.announcements: Dict[Tuple[str, str], _Announcement] = {}
+        self._lock = threading.Lock()
+
+    def update(self, user_id: str, key: str, text: str, parse_mode: str = 'HTML',
+               group_ids: Optional[List[str]] = None, pin: bool = True,
+               immediate: bool = False) -> Dict[str, Any]:
+        """Registrar o novo conteúdo do anúncio e agendar a publicação"""
+        with self._lock:
+            announcement = self.announcements.get((user_id, key))
+            if announcement is None:
+                announcement = _Announcement(user_id, key)
+                self.announcements[(user_id, key)] = announcement
+
+            if announcement.pending:
+                announcement.coalesced += 1
+            announcement.updates += 1
+            announcement.retries = 0
+            announcement.text = text
+            announcement.parse_mode = parse_mode
+            announcement.pin = pin
+
+            if group_ids is None and not announcement.group_ids:
+                group_ids = [str(group['id']) for group in self.bot_manager.groups.get(user_id, [])]
+            for group_id in group_ids or []:
+                if str(group_id) not in announcement.group_ids:
+                    announcement.group_ids.append(str(group_id))
+
+            if not immediate:
+                self._schedule(announcement)
+                return {"success": True, "status": "scheduled", **self._describe(announcement)}
+
+            if announcement.timer is not None:
+                announcement.timer.cancel()
+                announcement.timer = None
+
+        self._flush(announcement)
+        with self._lock:
+            return {"success": True, "status": "published", **self._describe(announcement)}
+
+    def _schedule(self, announcement: _Announcement) -> None:
+        """(Re)agendar a publicação respeitando debounce e max_delay (com lock)"""
+        now = time.monotonic()
+        if not announcement.pending:
+            announcement.pending = True
+            announcement.first_pending_at = now
+        delay = min(self.debounce, announcement.first_pending_at + self.max_delay - now)
+        self._start_timer(announcement, delay)
+
+    def _schedule_retry(self, announcement: _Announcement) -> None:
+        """Agendar nova publicação nos grupos que falharam (com lock)"""
+        delay = min(self.RETRY_MAX_DELAY, self.RETRY_BASE_DELAY * 2 ** (announcement.retries - 1))
+        announcement.pending = True
+        announcement.first_pending_at = time.monotonic()
+        self._start_timer(announcement, delay)
+
+    def _start_timer(self, announcement: _Announcement, delay: float) -> None:
+        if announcement.timer is not None:
+            announcement.timer.cancel()
+        announcement.timer = threading.Timer(max(0.0, delay), self._flush, args=(announcement,))
+        announcement.timer.daemon = True
+        announcement.timer.start()
+
+    def _flush(self, announcement: _Announcement) -> None:
+        """Publicar o conteúdo mais recente nos grupos que ainda não o têm"""
+        with announcement.flush_lock:
+            with self._lock:
+                # Timer disparado depois do remove(): nada a publicar
+                if announcement.removed:
+                    return
+                # Um update() pode ter agendado outro Timer enquanto este
+                # aguardava o lock; ele continua valendo e cancelável
+                if announcement.timer is None or announcement.timer is threading.current_thread():
+                    announcement.pending = False
+                    announcement.timer = None
+                text = announcement.text
+                parse_mode = announcement.parse_mode
+                pin = announcement.pin
+                targets = {
+                    group_id: announcement.messages.get(group_id)
+                    for group_id in announcement.group_ids
+                    if announcement.sent_text.get(group_id) != text
+                }
+
+            if not targets:
+                return
+
+            try:
+                result = self.bot_manager.sync_announcement(announcement.user_id, text, parse_mode, targets, pin)
+            except Exception as e:
+                logger.error(f"Erro ao publicar anúncio {announcement.key}: {str(e)}")
+                result = {"error": str(e)}
+
+            with self._lock:
+                announcement.flushes += 1
+                announcement.last_flush_at = time.time()
+                if "error" in result:
+                    failed = len(targets)
+                    announcement.last_results = [{"success": False, "error": result["error"]}]
+                else:
+                    failed = 0
+                    for item in result["results"]:
+                        if not item["success"]:
+                            failed += 1
+                            continue
+                        if item["action"] == "sent":
+                            announcement.sent += 1
+                        elif item["action"] == "edited":
+                            announcement.edited += 1
+                        announcement.messages[item["group_id"]] = item["message_id"]
+                        announcement.sent_text[item["group_id"]] = text
+                    announcement.last_results = result["results"]
+                announcement.failed += failed
+
+                if not failed:
+                    announcement.retries = 0
+                    return
+                announcement.retries += 1
+                # Uma publicação já agendada também cobre os grupos que falharam
+                if announcement.removed or announcement.timer is not None:
+                    return
+                if announcement.retries > self.RETRY_LIMIT:
+                    logger.error(f"Anúncio {announcement.key}: desistindo após {self.RETRY_LIMIT} tentativas")
+                    return
+                self._schedule_retry(announcement)
+
+    def get(self, user_id: str, key: str) -> Optional[Dict[str, Any]]:
+        """Estado e estatísticas do anúncio"""
+        with self._lock:
+            announcement = self.announcements.get((user_id, key))
+            if announcement is None:
+                return None
+            return self._describe(announcement)
+
+    def remove(self, user_id: str, key: str, unpin: bool = True) -> Optional[Dict[str, Any]]:
+        """Parar de acompanhar o anúncio e, opcionalmente, desafixá-lo"""
+        with self._lock:
+            announcement = self.announcements.pop((user_id, key), None)
+            if announcement is None:
+                return None
+            announcement.removed = True
+            if announcement.timer is not None:
+                announcement.timer.cancel()
+
+        # Aguardar uma publicação em andamento para incluir as mensagens
+        # que ela acabou de enviar
+        with announcement.flush_lock:
+            with self._lock:
+                messages = dict(announcement.messages)
+
+        if unpin and messages:
+            return self.bot_manager.unpin_announcement(user_id, messages)
+        return {"success": True, "message": "Anúncio removido"}
+
+    def _describe(self, announcement: _Announcement) -> Dict[str, Any]:
+        return {
+            "key": announcement.key,
+            "text": announcement.text,
+            "pending": announcement.pending,
+            "groups": {
+                group_id: {
+                    "message_id": announcement.messages.get(group_id),
+                    "up_to_date": announcement.sent_text.get(group_id) == announcement.text
+                }
+                for group_id in announcement.group_ids
+            },
+            "stats": {
+                "updates": announcement.updates,
+                "coalesced": announcement.coalesced,
+                "flushes": announcement.flushes,
+                "sent": announcement.sent,
+                "edited": announcement.edited,
+                "failed": announcement.failed,
+                "retries": announcement.retries
+            },
+            "last_flush_at": announcement.last_flush_at,
+            "last_results": announcement.last_results
+        }
@@ -1,8 +1,15 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 import os
+import hmac
+import math
+import time
 from dotenv import load_dotenv
 from telegram_bot_manager import TelegramBotManager
+from tenant_scheduler import TenantScheduler, QuotaExceeded, parse_weights
+from tracing import tracer, profiler
+from announcements import AnnouncementPublisher
+from serialization import dumps, parse_fields, select_fields, make_etag, compress
 import logging
 
 # Carregar variáveis de ambiente
@@ -16,7 +23,139 @@ app = Flask(__name__)
 CORS(app)
 
 # Instância global do gerenciador de bots
-bot_manager = TelegramBotManager()
+bot_manager = TelegramBotManager(
+    bulk_concurrency=int(os.environ.get('BULK_CONCURRENCY', 8)),
+    rate_limit=float(os.environ.get('TELEGRAM_RATE_LIMIT', 25)),
+    flood_retries=int(os.environ.get('TELEGRAM_FLOOD_RETRIES', 3))
+)
+
+# Anúncios fixados, atualizados por edição com debounce
+announcements = AnnouncementPublisher(
+    bot_manager,
+    debounce=float(os.environ.get('ANNOUNCEMENT_DEBOUNCE_SECONDS', 2)),
+    max_delay=float(os.environ.get('ANNOUNCEMENT_MAX_DELAY_SECONDS', 10))
+)
+
+# Limite de chats por requisição nas operações em lote
+BULK_MAX_CHATS = int(os.environ.get('BULK_MAX_CHATS', 500))
+
+# Escalonador justo entre usuários (filas por user_id e cotas)
+SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'True').lower() == 'true'
+scheduler = TenantScheduler(
+    max_workers=int(os.environ.get('SCHEDULER_MAX_WORKERS', 16)),
+    tenant_concurrency=int(os.environ.get('TENANT_MAX_CONCURRENCY', 4)),
+    rate_limit=float(os.environ.get('TENANT_RATE_LIMIT', 10)),
+    burst=float(os.environ.get('TENANT_BURST', 20)),
+    max_queue=int(os.environ.get('TENANT_MAX_QUEUE', 32)),
+    max_wait=float(os.environ.get('TENANT_MAX_WAIT', 10)),
+    weights=parse_weights(os.environ.get('TENANT_WEIGHTS', '')),
+    usage_ttl=float(os.environ.get('TENANT_USAGE_TTL', 3600))
+)
+
+# Endpoints que não consomem cota do usuário
+UNSCHEDULED_ENDPOINTS = {'health_check', 'tenant_usage', 'scheduler_usage'}
+
+# Respostas menores que isso não são comprimidas (bytes)
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+
+# Token exigido pelos endpoints de diagnóstico (header X-Debug-Token);
+# sem ele configurado os endpoints /debug/* ficam desativados
+DEBUG_API_TOKEN = os.environ.get('DEBUG_API_TOKEN', '')
+
+@app.before_request
+def guard_debug_endpoints():
+    """Bloquear /debug/* sem DEBUG_API_TOKEN configurado ou com token inválido"""
+    if not (request.endpoint or '').startswith('debug_'):
+        return None
+    if not DEBUG_API_TOKEN:
+        return jsonify({"error": "Endpoint não encontrado"}), 404
+    token = request.headers.get('X-Debug-Token', '')
+    if not hmac.compare_digest(token.encode('utf-8'), DEBUG_API_TOKEN.encode('utf-8')):
+        return jsonify({"error": "Token de diagnóstico inválido"}), 403
+    return None
+
+@app.before_request
+def start_trace():
+    """Iniciar o trace da requisição (quando o tracing está ativo)"""
+    if request.endpoint and request.endpoint.startswith('debug_'):
+        return None
+    tracer.start_trace(
+        f"{request.method} {request.url_rule.rule if request.url_rule else request.path}",
+        **{"http.method": request.method, "http.target": request.path}
+    )
+    return None
+
+@app.after_request
+def finish_trace(response):
+    """Encerrar o trace e devolver o trace_id no header X-Trace-Id"""
+    trace = tracer.finish_trace(**{"http.status_code": response.status_code})
+    if trace is not None:
+        response.headers['X-Trace-Id'] = trace.trace_id
+    return response
+
+@app.before_request
+def admit_request():
+    """Controle de admissão por user_id antes de executar a rota"""
+    if not SCHEDULER_ENABLED or request.endpoint in UNSCHEDULED_ENDPOINTS:
+        return None
+    user_id = (request.view_args or {}).get('user_id')
+    # Usuários sem bot registrado não geram chamadas ao Telegram nem
+    # estado no escalonador
+    if not user_id or user_id not in bot_manager.bots:
+        return None
+    try:
+        with tracer.span("scheduler.admission", user_id=user_id):
+            scheduler.acquire(user_id)
+    except QuotaExceeded as e:
+        logger.warning(f"Requisição rejeitada para {user_id}: {str(e)}")
+        response = jsonify({"error": str(e), "retry_after": round(e.retry_after, 2)})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, math.ceil(e.retry_after)))
+        return response
+    g.scheduled_user = user_id
+    g.scheduled_at = time.monotonic()
+    return None
+
+@app.teardown_request
+def release_request(exc=None):
+    """Liberar a vaga do usuário ao final da requisição"""
+    user_id = g.pop('scheduled_user', None)
+    if user_id is not None:
+        scheduler.release(user_id, time.monotonic() - g.pop('scheduled_at'))
+    # Requisições interrompidas por exceção não passam pelo after_request
+    tracer.finish_trace()
+
+def not_modified(etag):
+    """Resposta 304 para a ETag informada"""
+    response = app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+def json_response(result, etag=None, content_etag=False):
+    """
+    Serializar o resultado de uma rota em JSON.
+
+    Com etag (ou content_etag, calculada a partir do corpo), responde 304
+    quando o cliente já tem a mesma versão (If-None-Match). Respostas
+    grandes são comprimidas com brotli ou gzip.
+    """
+    with tracer.span("serialize.json"):
+        body = dumps(result)
+    if content_etag:
+        etag = make_etag(body)
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+    with tracer.span("serialize.compress"):
+        body, encoding = compress(body, request.headers.get('Accept-Encoding', ''), COMPRESSION_MIN_SIZE)
+    
+    response = app.response_class(body, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+    return response
+
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -35,7 +174,7 @@ def register_bot():
             return jsonify({"error": "user_id e bot_token são obrigatórios"}), 400
         
         result = bot_manager.register_bot(user_id, bot_token)
-        return jsonify(result)
+        return json_response(result)
     
     except Exception as e:
         logger.error(f"Erro ao registrar bot: {str(e)}")
@@ -47,30 +186,65 @@ def create_group(user_id):
     try:
         data = request.get_json()
         result = bot_manager.create_group(user_id, data)
-        return jsonify(result)
+        return json_response(result)
     
     except Exception as e:
         logger.error(f"Erro ao criar grupo: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/bot/<user_id>/groups/bulk-create', methods=['POST'])
+def bulk_create_groups(user_id):
+    """Configurar vários grupos existentes em uma única requisição"""
+    try:
+        data = request.get_json()
+        chats = data.get('chats', [])
+        require_admin = data.get('require_admin', True)
+        
+        if not chats or not isinstance(chats, list):
+            return jsonify({"error": "chats deve ser uma lista de chat_id ou @username"}), 400
+        if len(chats) > BULK_MAX_CHATS:
+            return jsonify({"error": f"Máximo de {BULK_MAX_CHATS} chats por requisição"}), 400
+        
+        result = bot_manager.bulk_create_groups(user_id, chats, require_admin)
+        return json_response(result)
+    
+    except Exception as e:
+        logger.error(f"Erro ao configurar grupos em lote: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/bot/<user_id>/group/<group_id>/edit', methods=['PUT'])
 def edit_group(user_id, group_id):
     """Editar um grupo existente"""
     try:
         data = request.get_json()
         result = bot_manager.edit_group(user_id, group_id, data)
-        return jsonify(result)
+        return json_response(result)
     
     except Exception as e:
         logger.error(f"Erro ao editar grupo: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/bot/<user_id>/groups/policy', methods=['POST'])
+def apply_policy(user_id):
+    """Aplicar permissões ou bloqueio a vários grupos de uma vez"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "Informe permissions ou action"}), 400
+        
+        result = bot_manager.apply_policy(user_id, data)
+        return json_response(result)
+    
+    except Exception as e:
+        logger.error(f"Erro ao aplicar política: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/bot/<user_id>/group/<group_id>/delete', methods=['DELETE'])
 def delete_group(user_id, group_id):
     """Excluir um grupo"""
     try:
         result = bot_manager.delete_group(user_id, group_id)
-        return jsonify(result)
+        return json_response(result)
     
     except Exception as e:
         logger.error(f"Erro ao excluir grupo: {str(e)}")
@@ -83,7 +257,7 @@ def add_members(user_id, group_id):
         data = request.get_json()
         members = data.get('members', [])
         result = bot_manager.add_members(user_id, group_id, members)
-        return jsonify(result)
+        return json_response(result)
     
     except Exception as e:
         logger.error(f"Erro ao adicionar membros: {str(e)}")
@@ -96,7 +270,7 @@ def remove_members(user_id, group_id):
         data = request.get_json()
         members = data.get('members', [])
         result = bot_manager.remove_members(user_id, group_id, members)
-        return jsonify(result)
+        return json_response(result)
     
     except Exception as e:
         logger.error(f"Erro ao remover membros: {str(e)}")
@@ -114,18 +288,83 @@ def send_message(user_id, group_id):
             return jsonify({"error": "Mensagem é obrigatória"}), 400
         
         result = bot_manager.send_message(user_id, group_id, message, parse_mode)
-        return jsonify(result)
+        return json_response(result)
     
     except Exception as e:
         logger.error(f"Erro ao enviar mensagem: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/bot/<user_id>/announcements/<key>', methods=['POST'])
+def publish_announcement(user_id, key):
+    """Publicar ou atualizar um anúncio fixado nos grupos"""
+    try:
+        data = request.get_json()
+        message = data.get('message')
+        
+        if not message:
+            return jsonify({"error": "Mensagem é obrigatória"}), 400
+        group_ids = data.get('group_ids')
+        if group_ids is not None and not isinstance(group_ids, list):
+            return jsonify({"error": "group_ids deve ser uma lista de chat_id"}), 400
+        if user_id not in bot_manager.bots:
+            return jsonify({"error": "Bot não registrado para este usuário"}), 400
+        
+        result = announcements.update(
+            user_id, key, message,
+            parse_mode=data.get('parse_mode', 'HTML'),
+            group_ids=group_ids,
+            pin=data.get('pin', True),
+            immediate=data.get('immediate', False)
+        )
+        response = json_response(result)
+        if result.get('status') == 'scheduled':
+            response.status_code = 202
+        return response
+    
+    except Exception as e:
+        logger.error(f"Erro ao publicar anúncio: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/bot/<user_id>/announcements/<key>', methods=['GET'])
+def get_announcement(user_id, key):
+    """Obter o estado de um anúncio"""
+    try:
+        result = announcements.get(user_id, key)
+        if result is None:
+            return jsonify({"error": "Anúncio não encontrado"}), 404
+        return json_response({"success": True, "announcement": result})
+    
+    except Exception as e:
+        logger.error(f"Erro ao obter anúncio: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/bot/<user_id>/announcements/<key>', methods=['DELETE'])
+def delete_announcement(user_id, key):
+    """Remover um anúncio (e desafixar as mensagens, ?unpin=false para manter)"""
+    try:
+        unpin = request.args.get('unpin', 'true').lower() == 'true'
+        result = announcements.remove(user_id, key, unpin)
+        if result is None:
+            return jsonify({"error": "Anúncio não encontrado"}), 404
+        return json_response(result)
+    
+    except Exception as e:
+        logger.error(f"Erro ao remover anúncio: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/bot/<user_id>/groups', methods=['GET'])
 def list_groups(user_id):
-    """Listar grupos do usuário"""
+    """Listar grupos do usuário (?fields=id,title)"""
     try:
-        result = bot_manager.list_groups(user_id)
-        return jsonify(result)
+        fields = parse_fields(request.args.get('fields'))
+        # A versão do registro muda a cada alteração nos grupos do usuário,
+        # então o 304 é respondido sem serializar a lista
+        etag = make_etag(bot_manager.groups_version(user_id), fields)
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+        
+        result = select_fields(bot_manager.list_groups(user_id), fields)
+        return json_response(result, etag)
     
     except Exception as e:
         logger.error(f"Erro ao listar grupos: {str(e)}")
@@ -133,15 +372,103 @@ def list_groups(user_id):
 
 @app.route('/bot/<user_id>/group/<group_id>/info', methods=['GET'])
 def get_group_info(user_id, group_id):
-    """Obter informações de um grupo específico"""
+    """Obter informações de um grupo específico (?fields=id,title)"""
     try:
-        result = bot_manager.get_group_info(user_id, group_id)
-        return jsonify(result)
+        fields = parse_fields(request.args.get('fields'))
+        result = select_fields(bot_manager.get_group_info(user_id, group_id), fields)
+        return json_response(result, content_etag=True)
     
     except Exception as e:
         logger.error(f"Erro ao obter informações do grupo: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/bot/<user_id>/usage', methods=['GET'])
+def tenant_usage(user_id):
+    """Obter uso e cotas do usuário no escalonador"""
+    try:
+        return jsonify({"success": True, "usage": scheduler.usage(user_id)})
+    
+    except Exception as e:
+        logger.error(f"Erro ao obter uso do usuário: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/scheduler/usage', methods=['GET'])
+def scheduler_usage():
+    """Obter uso de todos os usuários no escalonador"""
+    try:
+        return jsonify({"success": True, **scheduler.usage_all()})
+    
+    except Exception as e:
+        logger.error(f"Erro ao obter uso do escalonador: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/debug/tracing', methods=['GET', 'PUT'])
+def debug_tracing():
+    """Consultar ou alterar a configuração do tracing em tempo de execução"""
+    try:
+        if request.method == 'PUT':
+            data = request.get_json() or {}
+            settings = tracer.configure(
+                enabled=data.get('enabled'),
+                sample_rate=data.get('sample_rate'),
+                slow_threshold_ms=data.get('slow_threshold_ms')
+            )
+            return jsonify({"success": True, "settings": settings})
+        return jsonify({"success": True, "settings": tracer.settings()})
+    
+    except Exception as e:
+        logger.error(f"Erro ao configurar tracing: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/debug/traces', methods=['GET'])
+def debug_traces():
+    """Exportar traces recentes (?slow=true, ?format=json|otlp)"""
+    try:
+        slow_only = request.args.get('slow', 'false').lower() == 'true'
+        fmt = request.args.get('format', 'json')
+        if fmt not in ('json', 'otlp'):
+            return jsonify({"error": "format deve ser json ou otlp"}), 400
+        return jsonify(tracer.export(slow_only=slow_only, fmt=fmt))
+    
+    except Exception as e:
+        logger.error(f"Erro ao exportar traces: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/debug/profiler', methods=['GET'])
+def debug_profiler_report():
+    """Obter as pilhas amostradas (?format=collapsed para flame graph)"""
+    try:
+        if request.args.get('format') == 'collapsed':
+            return app.response_class(profiler.collapsed(), mimetype='text/plain')
+        limit = int(request.args.get('limit', 50))
+        return jsonify({"success": True, **profiler.report(limit)})
+    
+    except Exception as e:
+        logger.error(f"Erro ao obter relatório do profiler: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/debug/profiler/start', methods=['POST'])
+def debug_profiler_start():
+    """Ligar o profiler por amostragem"""
+    try:
+        data = request.get_json(silent=True) or {}
+        status = profiler.start(data.get('interval_ms', 10))
+        return jsonify({"success": True, **status})
+    
+    except Exception as e:
+        logger.error(f"Erro ao iniciar profiler: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/debug/profiler/stop', methods=['POST'])
+def debug_profiler_stop():
+    """Desligar o profiler por amostragem"""
+    try:
+        return jsonify({"success": True, **profiler.stop()})
+    
+    except Exception as e:
+        logger.error(f"Erro ao parar profiler: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
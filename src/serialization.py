@@ -0,0 +1,95 @@
+import gzip
+import hashlib
+import json
+from typing import Dict, List, Any, Optional, Tuple
+
+# Dependências opcionais: usadas apenas se estiverem instaladas
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def dumps(obj: Any) -> bytes:
+    """Serializar em JSON compacto, usando orjson quando disponível"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def parse_fields(raw: Optional[str]) -> Optional[List[str]]:
+    """Converter '?fields=id,title' em lista de campos (None = todos)"""
+    if not raw:
+        return None
+    fields = [field.strip() for field in raw.split(',') if field.strip()]
+    return fields or None
+
+
+def select_fields(result: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """Manter apenas os campos pedidos em 'groups' e 'group'"""
+    if not fields:
+        return result
+    selected = dict(result)
+    if isinstance(result.get('groups'), list):
+        selected['groups'] = [
+            {field: group[field] for field in fields if field in group}
+            for group in result['groups']
+        ]
+    if isinstance(result.get('group'), dict):
+        selected['group'] = {field: result['group'][field] for field in fields if field in result['group']}
+    return selected
+
+
+def make_etag(*parts: Any) -> str:
+    """ETag curta a partir de bytes ou valores quaisquer"""
+    digest = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Converter o Accept-Encoding em {codificação: q}"""
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+def compress(body: bytes, accept_encoding: str, min_size: int) -> Tuple[bytes, Optional[str]]:
+    """Comprimir com brotli ou gzip conforme o Accept-Encoding do cliente"""
+    if len(body) < min_size:
+        return body, None
+    accepted = accepted_encodings(accept_encoding)
+    wildcard = accepted.get('*', 0.0)
+
+    # Codificações com q=0 não são aceitas; em empate, brotli é preferido
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+
+    if best == 'br':
+        return brotli.compress(body, quality=4), 'br'
+    if best == 'gzip':
+        return gzip.compress(body, compresslevel=5), 'gzip'
+    return body, None
@@ -1,28 +1,209 @@
 import asyncio
+import itertools
 import logging
-from typing import Dict, List, Any
+import threading
+import time
+import uuid
+from typing import Dict, List, Any, Optional
 from telegram import Bot, ChatPermissions
-from telegram.error import TelegramError
+from telegram.error import TelegramError, RetryAfter, BadRequest
+from telegram.request import HTTPXRequest
+from tracing import tracer
 
 logger = logging.getLogger(__name__)
 
+# Permissões aceitas pela API e seus valores padrão
+DEFAULT_PERMISSIONS = {
+    "can_send_messages": True,
+    "can_send_media_messages": True,
+    "can_send_polls": True,
+    "can_send_other_messages": True,
+    "can_add_web_page_previews": True,
+    "can_change_info": False,
+    "can_invite_users": False,
+    "can_pin_messages": False
+}
+
+# A partir da Bot API 6.5 o envio de mídia é controlado por tipo
+MEDIA_PERMISSIONS = (
+    "can_send_audios", "can_send_documents", "can_send_photos",
+    "can_send_videos", "can_send_video_notes", "can_send_voice_notes"
+)
+
+def normalize_permissions(data: Dict[str, Any]) -> Dict[str, bool]:
+    """Completar as permissões informadas com os valores padrão"""
+    return {key: bool(data.get(key, default)) for key, default in DEFAULT_PERMISSIONS.items()}
+
+def build_chat_permissions(data: Dict[str, Any]) -> ChatPermissions:
+    """Converter o dicionário de permissões da API em ChatPermissions"""
+    permissions = normalize_permissions(data)
+    can_send_media = permissions.pop("can_send_media_messages")
+    for key in MEDIA_PERMISSIONS:
+        permissions[key] = can_send_media
+    return ChatPermissions(**permissions)
+
+# Todos os campos de ChatPermissions; os snapshots usados para desfazer
+# alterações guardam todos eles, inclusive os que a API não expõe
+CHAT_PERMISSION_FIELDS = (
+    "can_send_messages", "can_send_polls", "can_send_other_messages",
+    "can_add_web_page_previews", "can_change_info", "can_invite_users",
+    "can_pin_messages", "can_manage_topics"
+) + MEDIA_PERMISSIONS
+
+# Campos que as políticas não alteram (mantêm o valor atual do grupo)
+UNMANAGED_PERMISSIONS = tuple(
+    key for key in CHAT_PERMISSION_FIELDS
+    if key not in DEFAULT_PERMISSIONS and key not in MEDIA_PERMISSIONS
+)
+
+def snapshot_permissions(permissions: ChatPermissions) -> Dict[str, bool]:
+    """Copiar todas as permissões de um ChatPermissions"""
+    data = permissions.to_dict()
+    return {key: bool(data.get(key, False)) for key in CHAT_PERMISSION_FIELDS}
+
+class RateLimiter:
+    """
+    Token bucket compartilhado por todas as chamadas de um bot.
+
+    Funciona entre threads e event loops diferentes: cada chamada reserva
+    um token sob um lock comum e aguarda com asyncio.sleep o tempo
+    necessário. Um RetryAfter do Telegram pausa todas as chamadas do bot.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Reservar um token e retornar quantos segundos aguardar"""
+        with self._lock:
+            now = time.monotonic()
+            if self.rate <= 0:
+                return max(0.0, self.blocked_until - now)
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            # Saldo negativo enfileira as chamadas na ordem de reserva
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(delay, self.blocked_until - now)
+
+    def pause(self, seconds: float) -> None:
+        """Bloquear o bot pelo tempo pedido no RetryAfter"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def wait(self) -> float:
+        """Aguardar a vez da chamada e retornar o tempo esperado"""
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
 class TelegramBotManager:
-    def __init__(self):
+    def __init__(self, bulk_concurrency: int = 8, rate_limit: float = 25.0, flood_retries: int = 3):
+        # Chamadas simultâneas ao Telegram nas operações em lote
+        # (também é o tamanho do pool de conexões de cada bot)
+        self.bulk_concurrency = bulk_concurrency
+        # Chamadas por segundo de cada bot nas operações em lote
+        self.rate_limit = rate_limit
+        # Quantas vezes repetir uma chamada após RetryAfter
+        self.flood_retries = flood_retries
+        self.rate_limiters: Dict[str, RateLimiter] = {}  # bot_token -> limitador
         self.bots: Dict[str, Bot] = {}
         self.user_bots: Dict[str, str] = {}  # user_id -> bot_token mapping
         self.groups: Dict[str, List[Dict]] = {}  # user_id -> list of groups
+        self.groups_versions: Dict[str, int] = {}  # user_id -> versão da lista de grupos
+        self._versions = itertools.count(1)  # next() é atômico entre threads
+        self.group_permissions: Dict[str, Dict[str, Dict[str, bool]]] = {}  # user_id -> group_id -> snapshot das permissões conhecidas
+        self.locked_permissions: Dict[str, Dict[str, Dict[str, bool]]] = {}  # user_id -> group_id -> snapshot antes do bloqueio
+        self.instance_id = uuid.uuid4().hex[:8]
+    
+    def _touch_groups(self, user_id: str) -> None:
+        """Marcar a lista de grupos do usuário como alterada"""
+        self.groups_versions[user_id] = next(self._versions)
+    
+    def _known_permissions(self, user_id: str) -> Dict[str, Dict[str, bool]]:
+        """Últimas permissões aplicadas ou lidas de cada grupo do usuário"""
+        return self.group_permissions.setdefault(user_id, {})
+    
+    def groups_version(self, user_id: str) -> str:
+        """Versão atual da lista de grupos (muda a cada alteração e reinício)"""
+        return f"{self.instance_id}:{self.groups_versions.get(user_id, 0)}"
+    
+    def _new_loop(self) -> asyncio.AbstractEventLoop:
+        """Criar o event loop usado pelas chamadas da requisição"""
+        with tracer.span("event_loop.setup"):
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+        return loop
+    
+    def _run(self, loop: asyncio.AbstractEventLoop, coro) -> Any:
+        """Executar uma chamada da API do Telegram no loop"""
+        with tracer.span(f"telegram.{coro.__name__}"):
+            return loop.run_until_complete(coro)
+    
+    def _rate_limiter(self, bot: Bot) -> RateLimiter:
+        """Limitador de chamadas do bot (criado no primeiro uso)"""
+        limiter = self.rate_limiters.get(bot.token)
+        if limiter is None:
+            limiter = self.rate_limiters.setdefault(
+                bot.token, RateLimiter(self.rate_limit, max(1.0, self.rate_limit))
+            )
+        return limiter
+    
+    async def _call_with_retry(self, bot: Bot, method: str, make_call, **attributes) -> Any:
+        """Respeitar o limite do bot e repetir a chamada após RetryAfter"""
+        limiter = self._rate_limiter(bot)
+        retries = 0
+        waited = 0.0
+        # Um span por chamada, incluindo a espera no limitador e as repetições
+        with tracer.task_span(f"telegram.{method}", **attributes) as span:
+            try:
+                while True:
+                    waited += await limiter.wait()
+                    try:
+                        return await make_call()
+                    except RetryAfter as e:
+                        limiter.pause(e.retry_after)
+                        if retries >= self.flood_retries:
+                            raise
+                        retries += 1
+            finally:
+                if span is not None:
+                    span.attributes["rate_limit_wait_ms"] = round(waited * 1000, 3)
+                    span.attributes["flood_retries"] = retries
+    
+    @staticmethod
+    def _group_info(chat) -> Dict[str, Any]:
+        """Dados do grupo guardados no registro do usuário"""
+        return {
+            "id": chat.id,
+            "title": chat.title,
+            "type": chat.type,
+            "description": chat.description,
+            "invite_link": chat.invite_link,
+            "member_count": chat.member_count if hasattr(chat, 'member_count') else 0
+        }
         
+    @tracer.traced("manager.register_bot")
     def register_bot(self, user_id: str, bot_token: str) -> Dict[str, Any]:
         """Registrar um novo bot para um usuário"""
         try:
             # Criar instância do bot
-            bot = Bot(token=bot_token)
+            with tracer.span("bot.construct"):
+                bot = Bot(
+                    token=bot_token,
+                    request=HTTPXRequest(connection_pool_size=self.bulk_concurrency)
+                )
             
             # Testar se o token é válido
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            loop = self._new_loop()
             try:
-                bot_info = loop.run_until_complete(bot.get_me())
+                bot_info = self._run(loop, bot.get_me())
                 loop.close()
             except Exception as e:
                 return {"error": f"Token inválido: {str(e)}"}
@@ -31,6 +212,7 @@ class TelegramBotManager:
             self.bots[user_id] = bot
             self.user_bots[user_id] = bot_token
             self.groups[user_id] = []
+            self._touch_groups(user_id)
             
             return {
                 "success": True,
@@ -46,6 +228,7 @@ class TelegramBotManager:
             logger.error(f"Erro ao registrar bot: {str(e)}")
             return {"error": f"Erro ao registrar bot: {str(e)}"}
     
+    @tracer.traced("manager.create_group")
     def create_group(self, user_id: str, group_data: Dict[str, Any]) -> Dict[str, Any]:
         """Criar um novo grupo"""
         try:
@@ -57,13 +240,12 @@ class TelegramBotManager:
             # Extrair dados do grupo
             chat_id = group_data.get('chat_id')  # Para grupos existentes
             
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            loop = self._new_loop()
             
             try:
                 if chat_id:
                     # Se chat_id foi fornecido, obter informações do grupo existente
-                    chat = loop.run_until_complete(bot.get_chat(chat_id))
+                    chat = self._run(loop, bot.get_chat(chat_id))
                     group_info = {
                         "id": chat.id,
                         "title": chat.title,
@@ -86,6 +268,7 @@ class TelegramBotManager:
                     self.groups[user_id] = []
                 
                 self.groups[user_id].append(group_info)
+                self._touch_groups(user_id)
                 
                 return {
                     "success": True,
@@ -103,6 +286,122 @@ class TelegramBotManager:
             logger.error(f"Erro ao criar grupo: {str(e)}")
             return {"error": f"Erro ao criar grupo: {str(e)}"}
     
+    @tracer.traced("manager.bulk_create_groups")
+    def bulk_create_groups(self, user_id: str, chats: List[str], require_admin: bool = True) -> Dict[str, Any]:
+        """Configurar vários grupos existentes de uma vez (chat_id ou @username)"""
+        try:
+            if user_id not in self.bots:
+                return {"error": "Bot não registrado para este usuário"}
+            
+            bot = self.bots[user_id]
+            
+            # Remover entradas repetidas mantendo a ordem
+            unique_chats = list(dict.fromkeys(str(chat).strip() for chat in chats if str(chat).strip()))
+            
+            if user_id not in self.groups:
+                self.groups[user_id] = []
+            registered = {str(group['id']): group for group in self.groups[user_id]}
+            
+            # IDs numéricos já configurados não precisam ser consultados no
+            # Telegram; apenas @username e IDs novos são resolvidos
+            known = {}
+            to_resolve = []
+            for chat_ref in unique_chats:
+                if chat_ref in registered:
+                    known[chat_ref] = {
+                        "chat": chat_ref,
+                        "success": True,
+                        "status": "already_configured",
+                        "group": registered[chat_ref]
+                    }
+                else:
+                    to_resolve.append(chat_ref)
+            
+            resolved = []
+            if to_resolve:
+                loop = self._new_loop()
+                
+                try:
+                    resolved = self._run(loop, self._resolve_chats(bot, to_resolve, require_admin))
+                finally:
+                    loop.close()
+            
+            # Registrar os grupos resolvidos, ignorando os já configurados
+            # (um @username pode apontar para um grupo já registrado)
+            added = 0
+            for result in resolved:
+                if not result.get("success"):
+                    continue
+                group_info = result["group"]
+                if str(group_info["id"]) in registered:
+                    result["status"] = "already_configured"
+                    continue
+                registered[str(group_info["id"])] = group_info
+                self.groups[user_id].append(group_info)
+                result["status"] = "configured"
+                added += 1
+            
+            resolved_by_chat = {result["chat"]: result for result in resolved}
+            results = [known.get(chat_ref) or resolved_by_chat[chat_ref] for chat_ref in unique_chats]
+            if added:
+                self._touch_groups(user_id)
+            
+            return {
+                "success": True,
+                "message": f"Configurados {added} de {len(unique_chats)} grupos",
+                "configured": added,
+                "failed": sum(1 for result in results if not result.get("success")),
+                "results": results
+            }
+            
+        except TelegramError as e:
+            logger.error(f"Erro do Telegram ao configurar grupos em lote: {str(e)}")
+            return {"error": f"Erro do Telegram: {str(e)}"}
+        except Exception as e:
+            logger.error(f"Erro ao configurar grupos em lote: {str(e)}")
+            return {"error": f"Erro ao configurar grupos em lote: {str(e)}"}
+    
+    async def _resolve_chats(self, bot: Bot, chats: List[str], require_admin: bool) -> List[Dict[str, Any]]:
+        """Resolver os chats em paralelo e verificar se o bot é administrador"""
+        me = await self._call_with_retry(bot, "get_me", bot.get_me)
+        semaphore = asyncio.Semaphore(self.bulk_concurrency)
+        
+        async def resolve(chat_ref: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    chat = await self._call_with_retry(bot, "get_chat", lambda: bot.get_chat(chat_ref), chat_id=chat_ref)
+                    member = await self._call_with_retry(
+                        bot, "get_chat_member", lambda: bot.get_chat_member(chat.id, me.id), chat_id=str(chat.id)
+                    )
+                except TelegramError as e:
+                    return {"chat": chat_ref, "success": False, "error": f"Erro do Telegram: {str(e)}"}
+                except Exception as e:
+                    return {"chat": chat_ref, "success": False, "error": str(e)}
+            
+            is_admin = member.status in ("administrator", "creator")
+            if require_admin and not is_admin:
+                return {"chat": chat_ref, "success": False, "error": "O bot não é administrador do grupo"}
+            
+            admin_rights = {}
+            if member.status == "administrator":
+                admin_rights = {
+                    "can_change_info": member.can_change_info,
+                    "can_delete_messages": member.can_delete_messages,
+                    "can_invite_users": member.can_invite_users,
+                    "can_restrict_members": member.can_restrict_members,
+                    "can_pin_messages": member.can_pin_messages
+                }
+            return {
+                "chat": chat_ref,
+                "success": True,
+                "bot_status": member.status,
+                "admin_rights": admin_rights,
+                "group": self._group_info(chat)
+            }
+        
+        return await asyncio.gather(*(resolve(chat_ref) for chat_ref in chats))
+    
+    @tracer.traced("manager.edit_group")
     def edit_group(self, user_id: str, group_id: str, group_data: Dict[str, Any]) -> Dict[str, Any]:
         """Editar um grupo existente"""
         try:
@@ -111,34 +410,27 @@ class TelegramBotManager:
             
             bot = self.bots[user_id]
             
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            loop = self._new_loop()
             
             try:
                 # Atualizar título se fornecido
                 if 'title' in group_data:
-                    loop.run_until_complete(bot.set_chat_title(group_id, group_data['title']))
+                    self._run(loop, bot.set_chat_title(group_id, group_data['title']))
                 
                 # Atualizar descrição se fornecida
                 if 'description' in group_data:
-                    loop.run_until_complete(bot.set_chat_description(group_id, group_data['description']))
+                    self._run(loop, bot.set_chat_description(group_id, group_data['description']))
                 
                 # Atualizar permissões se fornecidas
                 if 'permissions' in group_data:
-                    permissions = ChatPermissions(
-                        can_send_messages=group_data['permissions'].get('can_send_messages', True),
-                        can_send_media_messages=group_data['permissions'].get('can_send_media_messages', True),
-                        can_send_polls=group_data['permissions'].get('can_send_polls', True),
-                        can_send_other_messages=group_data['permissions'].get('can_send_other_messages', True),
-                        can_add_web_page_previews=group_data['permissions'].get('can_add_web_page_previews', True),
-                        can_change_info=group_data['permissions'].get('can_change_info', False),
-                        can_invite_users=group_data['permissions'].get('can_invite_users', False),
-                        can_pin_messages=group_data['permissions'].get('can_pin_messages', False)
-                    )
-                    loop.run_until_complete(bot.set_chat_permissions(group_id, permissions))
+                    permissions = build_chat_permissions(group_data['permissions'])
+                    self._run(loop, bot.set_chat_permissions(
+                        group_id, permissions, use_independent_chat_permissions=True
+                    ))
+                    self._known_permissions(user_id)[str(group_id)] = snapshot_permissions(permissions)
                 
                 # Obter informações atualizadas do grupo
-                chat = loop.run_until_complete(bot.get_chat(group_id))
+                chat = self._run(loop, bot.get_chat(group_id))
                 group_info = {
                     "id": chat.id,
                     "title": chat.title,
@@ -153,6 +445,7 @@ class TelegramBotManager:
                     for i, group in enumerate(self.groups[user_id]):
                         if str(group['id']) == str(group_id):
                             self.groups[user_id][i] = group_info
+                            self._touch_groups(user_id)
                             break
                 
                 return {
@@ -171,6 +464,182 @@ class TelegramBotManager:
             logger.error(f"Erro ao editar grupo: {str(e)}")
             return {"error": f"Erro ao editar grupo: {str(e)}"}
     
+    @tracer.traced("manager.apply_policy")
+    def apply_policy(self, user_id: str, policy: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Aplicar permissões ou bloqueio/desbloqueio a vários grupos de uma vez.
+
+        policy aceita "permissions" ou "action" ("restrict" bloqueia todos
+        os envios, "unrestrict" restaura as permissões anteriores ao
+        bloqueio), além de "filter", "force" e "rollback_on_failure".
+        """
+        try:
+            if user_id not in self.bots:
+                return {"error": "Bot não registrado para este usuário"}
+            
+            bot = self.bots[user_id]
+            action = policy.get('action')
+            
+            if action not in (None, 'restrict', 'unrestrict'):
+                return {"error": "action deve ser restrict ou unrestrict"}
+            if action is None and not isinstance(policy.get('permissions'), dict):
+                return {"error": "Informe permissions ou action"}
+            
+            groups = self._filter_groups(user_id, policy.get('filter') or {})
+            known = self._known_permissions(user_id)
+            locked = self.locked_permissions.setdefault(user_id, {})
+            
+            # Snapshot das permissões desejadas para cada grupo
+            targets = {}
+            not_locked = {}
+            for group in groups:
+                group_id = str(group['id'])
+                if action == 'restrict':
+                    targets[group_id] = snapshot_permissions(
+                        build_chat_permissions({key: False for key in DEFAULT_PERMISSIONS})
+                    )
+                elif action == 'unrestrict':
+                    # Sem snapshot (bloqueado por outro meio ou antes de um
+                    # reinício) não há o que restaurar
+                    if group_id in locked:
+                        targets[group_id] = locked[group_id]
+                    else:
+                        not_locked[group_id] = {
+                            "group_id": group_id,
+                            "previous": known.get(group_id),
+                            "status": "skipped",
+                            "error": "Sem permissões anteriores ao bloqueio guardadas"
+                        }
+                else:
+                    targets[group_id] = snapshot_permissions(build_chat_permissions(policy['permissions']))
+            
+            applied = []
+            if targets:
+                loop = self._new_loop()
+                
+                try:
+                    applied = self._run(loop, self._apply_permissions(
+                        bot, targets, known,
+                        force=policy.get('force', False),
+                        rollback=policy.get('rollback_on_failure', True),
+                        # O desbloqueio restaura o snapshot inteiro
+                        keep_unmanaged=action != 'unrestrict'
+                    ))
+                finally:
+                    loop.close()
+            
+            # Guardar as permissões anteriores ao bloqueio para o desbloqueio
+            for result in applied:
+                if result["status"] != "applied":
+                    continue
+                if action == 'restrict' and result["previous"] is not None:
+                    locked.setdefault(result["group_id"], result["previous"])
+                elif action == 'unrestrict':
+                    locked.pop(result["group_id"], None)
+            
+            applied_by_group = {result["group_id"]: result for result in applied}
+            results = [not_locked.get(str(group['id'])) or applied_by_group[str(group['id'])] for group in groups]
+            
+            counts = {status: sum(1 for r in results if r["status"] == status)
+                      for status in ("applied", "skipped", "failed", "rate_limited", "rolled_back")}
+            
+            return {
+                "success": True,
+                "message": f"Política aplicada em {counts['applied']} de {len(results)} grupos",
+                **counts,
+                "results": results
+            }
+            
+        except TelegramError as e:
+            logger.error(f"Erro do Telegram ao aplicar política: {str(e)}")
+            return {"error": f"Erro do Telegram: {str(e)}"}
+        except Exception as e:
+            logger.error(f"Erro ao aplicar política: {str(e)}")
+            return {"error": f"Erro ao aplicar política: {str(e)}"}
+    
+    def _filter_groups(self, user_id: str, group_filter: Dict[str, Any]) -> List[Dict]:
+        """Selecionar os grupos do usuário pelo filtro da política"""
+        groups = self.groups.get(user_id, [])
+        if group_filter.get('group_ids'):
+            wanted = {str(group_id) for group_id in group_filter['group_ids']}
+            groups = [group for group in groups if str(group['id']) in wanted]
+        if group_filter.get('type'):
+            groups = [group for group in groups if group.get('type') == group_filter['type']]
+        if group_filter.get('title_contains'):
+            text = group_filter['title_contains'].lower()
+            groups = [group for group in groups if text in (group.get('title') or '').lower()]
+        return groups
+    
+    async def _apply_permissions(self, bot: Bot, targets: Dict[str, Dict[str, bool]],
+                                 known: Dict[str, Dict[str, bool]], force: bool,
+                                 rollback: bool, keep_unmanaged: bool = True) -> List[Dict[str, Any]]:
+        """Aplicar os snapshots de permissões em paralelo, desfazendo tudo se algum grupo falhar"""
+        semaphore = asyncio.Semaphore(self.bulk_concurrency)
+        
+        async def apply(group_id: str, target: Dict[str, bool]) -> Dict[str, Any]:
+            result = {"group_id": group_id, "previous": known.get(group_id)}
+            async with semaphore:
+                try:
+                    # Só consulta o Telegram quando o estado atual não é conhecido
+                    if result["previous"] is None:
+                        chat = await self._call_with_retry(bot, "get_chat", lambda: bot.get_chat(group_id), chat_id=group_id)
+                        if chat.permissions is not None:
+                            result["previous"] = snapshot_permissions(chat.permissions)
+                            known[group_id] = result["previous"]
+                    
+                    # Campos que a política não controla ficam como estão
+                    if keep_unmanaged and result["previous"] is not None:
+                        target = {**target, **{key: result["previous"][key] for key in UNMANAGED_PERMISSIONS}}
+                    
+                    if result["previous"] == target and not force:
+                        result["status"] = "skipped"
+                        return result
+                    
+                    await self._call_with_retry(bot, "set_chat_permissions", lambda: bot.set_chat_permissions(
+                        group_id, ChatPermissions(**target), use_independent_chat_permissions=True
+                    ), chat_id=group_id)
+                    known[group_id] = target
+                    result["status"] = "applied"
+                except RetryAfter as e:
+                    # Limite do Telegram esgotado: o grupo não foi alterado e
+                    # isso não deve desfazer a política nos demais grupos
+                    result["status"] = "rate_limited"
+                    result["error"] = f"Limite do Telegram excedido, tente em {e.retry_after}s"
+                except Exception as e:
+                    result["status"] = "failed"
+                    result["error"] = str(e)
+            return result
+        
+        async def restore(result: Dict[str, Any]) -> None:
+            async with semaphore:
+                try:
+                    await self._call_with_retry(bot, "set_chat_permissions", lambda: bot.set_chat_permissions(
+                        result["group_id"], ChatPermissions(**result["previous"]),
+                        use_independent_chat_permissions=True
+                    ), chat_id=result["group_id"])
+                    known[result["group_id"]] = result["previous"]
+                    result["status"] = "rolled_back"
+                except Exception as e:
+                    # O estado real do grupo passa a ser desconhecido
+                    known.pop(result["group_id"], None)
+                    result["rollback_error"] = str(e)
+        
+        results = await asyncio.gather(*(apply(group_id, target) for group_id, target in targets.items()))
+        
+        if rollback and any(result["status"] == "failed" for result in results):
+            to_restore = []
+            for result in results:
+                if result["status"] != "applied":
+                    continue
+                if result["previous"] is None:
+                    result["rollback_error"] = "Permissões anteriores desconhecidas"
+                else:
+                    to_restore.append(restore(result))
+            await asyncio.gather(*to_restore)
+        
+        return list(results)
+    
+    @tracer.traced("manager.delete_group")
     def delete_group(self, user_id: str, group_id: str) -> Dict[str, Any]:
         """Excluir um grupo (sair do grupo)"""
         try:
@@ -179,12 +648,11 @@ class TelegramBotManager:
             
             bot = self.bots[user_id]
             
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            loop = self._new_loop()
             
             try:
                 # Sair do grupo
-                loop.run_until_complete(bot.leave_chat(group_id))
+                self._run(loop, bot.leave_chat(group_id))
                 
                 # Remover da lista de grupos do usuário
                 if user_id in self.groups:
@@ -192,6 +660,9 @@ class TelegramBotManager:
                         group for group in self.groups[user_id] 
                         if str(group['id']) != str(group_id)
                     ]
+                    self._touch_groups(user_id)
+                self._known_permissions(user_id).pop(str(group_id), None)
+                self.locked_permissions.get(user_id, {}).pop(str(group_id), None)
                 
                 return {
                     "success": True,
@@ -208,6 +679,7 @@ class TelegramBotManager:
             logger.error(f"Erro ao excluir grupo: {str(e)}")
             return {"error": f"Erro ao excluir grupo: {str(e)}"}
     
+    @tracer.traced("manager.add_members")
     def add_members(self, user_id: str, group_id: str, members: List[str]) -> Dict[str, Any]:
         """Adicionar membros ao grupo"""
         try:
@@ -216,8 +688,7 @@ class TelegramBotManager:
             
             bot = self.bots[user_id]
             
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            loop = self._new_loop()
             
             try:
                 added_members = []
@@ -226,7 +697,7 @@ class TelegramBotManager:
                 for member in members:
                     try:
                         # Adicionar membro ao grupo
-                        loop.run_until_complete(bot.add_chat_member(group_id, member))
+                        self._run(loop, bot.add_chat_member(group_id, member))
                         added_members.append(member)
                     except Exception as e:
                         failed_members.append({"user": member, "error": str(e)})
@@ -248,6 +719,7 @@ class TelegramBotManager:
             logger.error(f"Erro ao adicionar membros: {str(e)}")
             return {"error": f"Erro ao adicionar membros: {str(e)}"}
     
+    @tracer.traced("manager.remove_members")
     def remove_members(self, user_id: str, group_id: str, members: List[str]) -> Dict[str, Any]:
         """Remover membros do grupo"""
         try:
@@ -256,8 +728,7 @@ class TelegramBotManager:
             
             bot = self.bots[user_id]
             
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            loop = self._new_loop()
             
             try:
                 removed_members = []
@@ -266,9 +737,9 @@ class TelegramBotManager:
                 for member in members:
                     try:
                         # Remover membro do grupo
-                        loop.run_until_complete(bot.ban_chat_member(group_id, member))
+                        self._run(loop, bot.ban_chat_member(group_id, member))
                         # Desbanir imediatamente para permitir reentrada
-                        loop.run_until_complete(bot.unban_chat_member(group_id, member))
+                        self._run(loop, bot.unban_chat_member(group_id, member))
                         removed_members.append(member)
                     except Exception as e:
                         failed_members.append({"user": member, "error": str(e)})
@@ -290,6 +761,7 @@ class TelegramBotManager:
             logger.error(f"Erro ao remover membros: {str(e)}")
             return {"error": f"Erro ao remover membros: {str(e)}"}
     
+    @tracer.traced("manager.send_message")
     def send_message(self, user_id: str, group_id: str, message: str, parse_mode: str = 'HTML') -> Dict[str, Any]:
         """Enviar mensagem para o grupo"""
         try:
@@ -298,12 +770,12 @@ class TelegramBotManager:
             
             bot = self.bots[user_id]
             
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            loop = self._new_loop()
             
             try:
                 # Enviar mensagem
-                sent_message = loop.run_until_complete(
+                sent_message = self._run(
+                    loop,
                     bot.send_message(
                         chat_id=group_id,
                         text=message,
@@ -328,6 +800,135 @@ class TelegramBotManager:
             logger.error(f"Erro ao enviar mensagem: {str(e)}")
             return {"error": f"Erro ao enviar mensagem: {str(e)}"}
     
+    @tracer.traced("manager.sync_announcement")
+    def sync_announcement(self, user_id: str, text: str, parse_mode: str,
+                          targets: Dict[str, Optional[int]], pin: bool = True) -> Dict[str, Any]:
+        """
+        Publicar o conteúdo de um anúncio em vários grupos.
+
+        targets mapeia group_id -> message_id já publicado (ou None). Grupos
+        com mensagem recebem edit_message_text; os demais recebem uma nova
+        mensagem, que é fixada quando pin é True.
+        """
+        try:
+            if user_id not in self.bots:
+                return {"error": "Bot não registrado para este usuário"}
+            
+            bot = self.bots[user_id]
+            
+            loop = self._new_loop()
+            
+            try:
+                results = self._run(loop, self._sync_announcement(bot, text, parse_mode, targets, pin))
+            finally:
+                loop.close()
+            
+            return {
+                "success": True,
+                "message": f"Anúncio publicado em {sum(1 for r in results if r['success'])} de {len(results)} grupos",
+                "results": results
+            }
+            
+        except TelegramError as e:
+            logger.error(f"Erro do Telegram ao publicar anúncio: {str(e)}")
+            return {"error": f"Erro do Telegram: {str(e)}"}
+        except Exception as e:
+            logger.error(f"Erro ao publicar anúncio: {str(e)}")
+            return {"error": f"Erro ao publicar anúncio: {str(e)}"}
+    
+    async def _sync_announcement(self, bot: Bot, text: str, parse_mode: str,
+                                 targets: Dict[str, Optional[int]], pin: bool) -> List[Dict[str, Any]]:
+        """Editar as mensagens existentes ou enviar e fixar novas, em paralelo"""
+        semaphore = asyncio.Semaphore(self.bulk_concurrency)
+        
+        async def publish(group_id: str, message_id: Optional[int]) -> Dict[str, Any]:
+            result = {"group_id": group_id, "success": True, "message_id": message_id}
+            async with semaphore:
+                try:
+                    if message_id is not None:
+                        try:
+                            await self._call_with_retry(bot, "edit_message_text", lambda: bot.edit_message_text(
+                                text, chat_id=group_id, message_id=message_id, parse_mode=parse_mode
+                            ), chat_id=group_id)
+                            result["action"] = "edited"
+                            return result
+                        except BadRequest as e:
+                            error = str(e).lower()
+                            if "not modified" in error:
+                                result["action"] = "unchanged"
+                                return result
+                            # Mensagem apagada no grupo: publicar de novo
+                            if "not found" not in error:
+                                raise
+                    
+                    sent = await self._call_with_retry(bot, "send_message", lambda: bot.send_message(
+                        chat_id=group_id, text=text, parse_mode=parse_mode
+                    ), chat_id=group_id)
+                    result["message_id"] = sent.message_id
+                    result["action"] = "sent"
+                    
+                    if pin:
+                        try:
+                            await self._call_with_retry(bot, "pin_chat_message", lambda: bot.pin_chat_message(
+                                group_id, sent.message_id, disable_notification=True
+                            ), chat_id=group_id)
+                            result["pinned"] = True
+                        except TelegramError as e:
+                            result["pinned"] = False
+                            result["pin_error"] = str(e)
+                except Exception as e:
+                    result["success"] = False
+                    result["error"] = str(e)
+            return result
+        
+        return await asyncio.gather(*(publish(group_id, message_id) for group_id, message_id in targets.items()))
+    
+    @tracer.traced("manager.unpin_announcement")
+    def unpin_announcement(self, user_id: str, messages: Dict[str, int]) -> Dict[str, Any]:
+        """Desafixar as mensagens de um anúncio (group_id -> message_id)"""
+        try:
+            if user_id not in self.bots:
+                return {"error": "Bot não registrado para este usuário"}
+            
+            bot = self.bots[user_id]
+            
+            async def unpin_all() -> List[Dict[str, Any]]:
+                semaphore = asyncio.Semaphore(self.bulk_concurrency)
+                
+                async def unpin(group_id: str, message_id: int) -> Dict[str, Any]:
+                    async with semaphore:
+                        try:
+                            await self._call_with_retry(
+                                bot, "unpin_chat_message", lambda: bot.unpin_chat_message(group_id, message_id),
+                                chat_id=group_id
+                            )
+                            return {"group_id": group_id, "success": True}
+                        except Exception as e:
+                            return {"group_id": group_id, "success": False, "error": str(e)}
+                
+                return await asyncio.gather(*(unpin(g, m) for g, m in messages.items()))
+            
+            loop = self._new_loop()
+            
+            try:
+                results = self._run(loop, unpin_all())
+            finally:
+                loop.close()
+            
+            return {
+                "success": True,
+                "message": "Anúncio desafixado",
+                "results": results
+            }
+            
+        except TelegramError as e:
+            logger.error(f"Erro do Telegram ao desafixar anúncio: {str(e)}")
+            return {"error": f"Erro do Telegram: {str(e)}"}
+        except Exception as e:
+            logger.error(f"Erro ao desafixar anúncio: {str(e)}")
+            return {"error": f"Erro ao desafixar anúncio: {str(e)}"}
+    
+    @tracer.traced("manager.list_groups")
     def list_groups(self, user_id: str) -> Dict[str, Any]:
         """Listar grupos do usuário"""
         try:
@@ -343,6 +944,7 @@ class TelegramBotManager:
             logger.error(f"Erro ao listar grupos: {str(e)}")
             return {"error": f"Erro ao listar grupos: {str(e)}"}
     
+    @tracer.traced("manager.get_group_info")
     def get_group_info(self, user_id: str, group_id: str) -> Dict[str, Any]:
         """Obter informações de um grupo específico"""
         try:
@@ -351,15 +953,14 @@ class TelegramBotManager:
             
             bot = self.bots[user_id]
             
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            loop = self._new_loop()
             
             try:
                 # Obter informações do grupo
-                chat = loop.run_until_complete(bot.get_chat(group_id))
+                chat = self._run(loop, bot.get_chat(group_id))
                 
                 # Obter administradores do grupo
-                administrators = loop.run_until_complete(bot.get_chat_administrators(group_id))
+                administrators = self._run(loop, bot.get_chat_administrators(group_id))
                 admin_list = []
                 for admin in administrators:
                     admin_list.append({
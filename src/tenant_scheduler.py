@@ -0,0 +1,302 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Deque
+
+
+class QuotaExceeded(Exception):
+    """Requisição rejeitada pelo controle de admissão (HTTP 429)"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    """Requisição aguardando uma vaga de execução"""
+
+    __slots__ = ("event", "granted", "enqueued_at", "start_tag", "finish_tag")
+
+    def __init__(self, start_tag: float, finish_tag: float):
+        self.event = threading.Event()
+        self.granted = False
+        self.enqueued_at = time.monotonic()
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+
+
+class _TenantUsage:
+    """Contadores acumulados de uso de um user_id"""
+
+    def __init__(self):
+        self.last_seen = time.monotonic()
+        self.admitted = 0
+        self.completed = 0
+        self.rejected_rate = 0
+        self.rejected_queue = 0
+        self.rejected_timeout = 0
+        self.total_wait = 0.0
+        self.total_busy = 0.0
+
+
+class _TenantState:
+    """Estado de fila e cota de um user_id"""
+
+    def __init__(self, weight: float, burst: float, usage: _TenantUsage):
+        self.weight = weight
+        self.tokens = burst
+        self.last_refill = time.monotonic()
+        self.virtual_finish = 0.0
+        self.waiters: Deque[_Ticket] = deque()
+        self.active = 0
+        self.usage = usage
+
+
+class TenantScheduler:
+    """
+    Escalonador justo entre usuários que compartilham a API.
+
+    Cada user_id tem uma fila própria; as vagas globais de execução são
+    distribuídas por enfileiramento justo ponderado (WFQ), respeitando o
+    limite de concorrência por usuário e uma cota de requisições por
+    segundo (token bucket). Quando o usuário excede a cota, a fila ou o
+    tempo máximo de espera, a requisição é rejeitada com QuotaExceeded.
+    rate_limit <= 0 desativa a cota por segundo.
+
+    O estado de fila e cota de usuários ociosos (sem requisições ativas
+    ou na fila e com a cota cheia) é descartado periodicamente; os
+    contadores de uso são mantidos até usage_ttl segundos sem requisições.
+    """
+
+    # Intervalo mínimo entre as limpezas de usuários ociosos (segundos)
+    SWEEP_INTERVAL = 5.0
+
+    def __init__(self, max_workers: int = 16, tenant_concurrency: int = 4,
+                 rate_limit: float = 10.0, burst: float = 20.0,
+                 max_queue: int = 32, max_wait: float = 10.0,
+                 weights: Optional[Dict[str, float]] = None,
+                 usage_ttl: float = 3600.0):
+        if max_workers < 1 or tenant_concurrency < 1:
+            raise ValueError("max_workers e tenant_concurrency devem ser maiores que zero")
+        if max_queue < 0 or max_wait < 0 or usage_ttl < 0:
+            raise ValueError("max_queue, max_wait e usage_ttl não podem ser negativos")
+        for user_id, weight in (weights or {}).items():
+            if weight <= 0:
+                raise ValueError(f"O peso de {user_id} deve ser maior que zero")
+        self.max_workers = max_workers
+        self.tenant_concurrency = tenant_concurrency
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.usage_ttl = usage_ttl
+        self.weights: Dict[str, float] = dict(weights or {})
+        self.tenants: Dict[str, _TenantState] = {}
+        self.usage_stats: Dict[str, _TenantUsage] = {}
+        self.active_total = 0
+        self.virtual_time = 0.0
+        self.last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate_limited(self) -> bool:
+        return self.rate_limit > 0
+
+    def set_weight(self, user_id: str, weight: float) -> None:
+        """Definir o peso de um usuário na divisão das vagas"""
+        if weight <= 0:
+            raise ValueError("O peso deve ser maior que zero")
+        with self._lock:
+            self.weights[user_id] = weight
+            if user_id in self.tenants:
+                self.tenants[user_id].weight = weight
+
+    def _tenant(self, user_id: str) -> _TenantState:
+        tenant = self.tenants.get(user_id)
+        if tenant is None:
+            usage = self.usage_stats.get(user_id)
+            if usage is None:
+                usage = self.usage_stats[user_id] = _TenantUsage()
+            tenant = _TenantState(self.weights.get(user_id, 1.0), self.burst, usage)
+            self.tenants[user_id] = tenant
+        return tenant
+
+    def _refill(self, tenant: _TenantState, now: float) -> None:
+        if not self.rate_limited:
+            tenant.tokens = self.burst
+            return
+        elapsed = max(0.0, now - tenant.last_refill)
+        tenant.tokens = min(self.burst, tenant.tokens + elapsed * self.rate_limit)
+        tenant.last_refill = now
+
+    def _sweep(self, now: float) -> None:
+        """Descartar o estado de usuários ociosos (chamar com o lock adquirido)"""
+        if now - self.last_sweep < self.SWEEP_INTERVAL:
+            return
+        self.last_sweep = now
+        for user_id in list(self.tenants):
+            tenant = self.tenants[user_id]
+            self._refill(tenant, now)
+            if not tenant.active and not tenant.waiters and tenant.tokens >= self.burst:
+                del self.tenants[user_id]
+        # Contadores de uso só expiram bem depois da fila e da cota
+        for user_id in list(self.usage_stats):
+            if user_id not in self.tenants and now - self.usage_stats[user_id].last_seen > self.usage_ttl:
+                del self.usage_stats[user_id]
+
+    def _dispatch(self) -> None:
+        """Distribuir vagas livres para as filas (chamar com o lock adquirido)"""
+        while self.active_total < self.max_workers:
+            chosen = None
+            for tenant in self.tenants.values():
+                if not tenant.waiters or tenant.active >= self.tenant_concurrency:
+                    continue
+                if chosen is None or tenant.waiters[0].finish_tag < chosen.waiters[0].finish_tag:
+                    chosen = tenant
+            if chosen is None:
+                return
+
+            ticket = chosen.waiters.popleft()
+            ticket.granted = True
+            self.virtual_time = max(self.virtual_time, ticket.start_tag)
+            chosen.active += 1
+            chosen.usage.admitted += 1
+            chosen.usage.total_wait += time.monotonic() - ticket.enqueued_at
+            self.active_total += 1
+            ticket.event.set()
+
+    def acquire(self, user_id: str) -> None:
+        """Aguardar uma vaga para o usuário ou levantar QuotaExceeded"""
+        with self._lock:
+            now = time.monotonic()
+            self._sweep(now)
+            tenant = self._tenant(user_id)
+            tenant.usage.last_seen = now
+            self._refill(tenant, now)
+
+            if self.rate_limited and tenant.tokens < 1:
+                tenant.usage.rejected_rate += 1
+                retry_after = (1 - tenant.tokens) / self.rate_limit
+                raise QuotaExceeded("Limite de requisições por segundo excedido", retry_after)
+
+            if len(tenant.waiters) >= self.max_queue:
+                tenant.usage.rejected_queue += 1
+                raise QuotaExceeded("Fila de requisições do usuário cheia", self._estimated_wait(tenant))
+
+            if self.rate_limited:
+                tenant.tokens -= 1
+            # Marcas de tempo virtual atribuídas na chegada
+            start_tag = max(self.virtual_time, tenant.virtual_finish)
+            tenant.virtual_finish = start_tag + 1.0 / tenant.weight
+            ticket = _Ticket(start_tag, tenant.virtual_finish)
+            tenant.waiters.append(ticket)
+            self._dispatch()
+
+        if ticket.event.wait(self.max_wait):
+            return
+
+        with self._lock:
+            # A vaga pode ter sido concedida entre o timeout e o lock
+            if ticket.granted:
+                return
+            tenant.waiters.remove(ticket)
+            tenant.usage.rejected_timeout += 1
+            raise QuotaExceeded("Tempo máximo de espera na fila excedido", self._estimated_wait(tenant))
+
+    def release(self, user_id: str, busy_time: float = 0.0) -> None:
+        """Liberar a vaga ocupada pelo usuário"""
+        with self._lock:
+            # Usuários com requisições ativas nunca são descartados
+            tenant = self.tenants[user_id]
+            tenant.active -= 1
+            tenant.usage.completed += 1
+            tenant.usage.total_busy += busy_time
+            tenant.usage.last_seen = time.monotonic()
+            self.active_total -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, user_id: str):
+        """Executar um bloco ocupando uma vaga do usuário"""
+        self.acquire(user_id)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(user_id, time.monotonic() - started)
+
+    def _estimated_wait(self, tenant: _TenantState) -> float:
+        """Estimativa grosseira de espera para o cabeçalho Retry-After"""
+        if tenant.usage.completed:
+            avg_busy = tenant.usage.total_busy / tenant.usage.completed
+        else:
+            avg_busy = 1.0
+        slots = max(1, min(self.tenant_concurrency, self.max_workers))
+        return max(1.0, avg_busy * (len(tenant.waiters) + 1) / slots)
+
+    def _tenant_usage(self, user_id: str, now: float) -> Dict[str, Any]:
+        """Uso de um usuário (chamar com o lock adquirido)"""
+        tenant = self.tenants.get(user_id)
+        usage = self.usage_stats.get(user_id) or _TenantUsage()
+        if tenant is not None:
+            self._refill(tenant, now)
+            tokens = tenant.tokens
+        else:
+            # Sem estado de fila: nada ativo e a cota está cheia
+            tokens = self.burst
+        return {
+            "user_id": user_id,
+            "weight": tenant.weight if tenant is not None else self.weights.get(user_id, 1.0),
+            "active": tenant.active if tenant is not None else 0,
+            "queued": len(tenant.waiters) if tenant is not None else 0,
+            "admitted": usage.admitted,
+            "completed": usage.completed,
+            "rejected": {
+                "rate_limit": usage.rejected_rate,
+                "queue_full": usage.rejected_queue,
+                "timeout": usage.rejected_timeout
+            },
+            "available_tokens": round(tokens, 2),
+            "avg_wait_ms": round(usage.total_wait / usage.admitted * 1000, 2) if usage.admitted else 0.0,
+            "avg_busy_ms": round(usage.total_busy / usage.completed * 1000, 2) if usage.completed else 0.0
+        }
+
+    def usage(self, user_id: str) -> Dict[str, Any]:
+        """Uso atual e acumulado de um usuário (sem criar estado)"""
+        with self._lock:
+            return self._tenant_usage(user_id, time.monotonic())
+
+    def usage_all(self) -> Dict[str, Any]:
+        """Uso de todos os usuários e limites globais do escalonador"""
+        with self._lock:
+            now = time.monotonic()
+            tenants = [self._tenant_usage(user_id, now) for user_id in self.usage_stats]
+            return {
+                "limits": {
+                    "max_workers": self.max_workers,
+                    "tenant_concurrency": self.tenant_concurrency,
+                    "rate_limit": self.rate_limit,
+                    "burst": self.burst,
+                    "max_queue": self.max_queue,
+                    "max_wait": self.max_wait,
+                    "usage_ttl": self.usage_ttl
+                },
+                "active": self.active_total,
+                "tenants": tenants
+            }
+
+
+def parse_weights(raw: str) -> Dict[str, float]:
+    """Converter 'user_a:2,user_b:0.5' em um dicionário de pesos"""
+    weights: Dict[str, float] = {}
+    for item in raw.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        user_id, _, weight = item.rpartition(':')
+        if user_id:
+            weights[user_id] = float(weight)
+            if weights[user_id] <= 0:
+                raise ValueError(f"O peso de {user_id} deve ser maior que zero")
+    return weights
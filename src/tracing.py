@@ -0,0 +1,347 @@
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Span pai das tarefas asyncio concorrentes (cada Task tem sua cópia)
+_task_parent: ContextVar[Optional[str]] = ContextVar("task_parent", default=None)
+
+
+class Span:
+    """Trecho cronometrado de uma requisição"""
+
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+
+class Trace:
+    """Conjunto de spans de uma requisição"""
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.stack: List[Span] = []
+        self.root = self.open_span(name, attributes)
+
+    def open_span(self, name: str, attributes: Dict[str, Any]) -> Span:
+        parent_id = self.stack[-1].span_id if self.stack else None
+        span = Span(name, parent_id, attributes)
+        self.spans.append(span)
+        self.stack.append(span)
+        return span
+
+    def add_span(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> Span:
+        """Criar um span com pai explícito, fora da pilha"""
+        span = Span(name, parent_id, attributes)
+        self.spans.append(span)
+        return span
+
+    def close_span(self, span: Span) -> None:
+        span.end_ns = time.time_ns()
+        if self.stack and self.stack[-1] is span:
+            self.stack.pop()
+
+    @property
+    def duration_ms(self) -> float:
+        return self.root.duration_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "duration_ms": round(self.duration_ms, 3),
+            "spans": [span.to_dict() for span in self.spans]
+        }
+
+    def to_otlp(self) -> List[Dict[str, Any]]:
+        """Spans no formato JSON do OpenTelemetry (OTLP)"""
+        spans = []
+        for span in self.spans:
+            otlp_span = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 2 if span is self.root else 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1}
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            spans.append(otlp_span)
+        return spans
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Tracer:
+    """
+    Tracing opcional das requisições.
+
+    Cada requisição amostrada ganha um Trace na thread atual; os spans
+    abertos com span() durante a requisição são aninhados nele. Traces
+    acima do limite de lentidão são registrados no log com o detalhamento
+    completo e guardados em memória para exportação.
+    """
+
+    def __init__(self, enabled: bool = False, sample_rate: float = 1.0,
+                 slow_threshold_ms: float = 1000.0, buffer_size: int = 100):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+        self.recent: deque = deque(maxlen=buffer_size)
+        self.slow: deque = deque(maxlen=buffer_size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: Optional[bool] = None, sample_rate: Optional[float] = None,
+                  slow_threshold_ms: Optional[float] = None) -> Dict[str, Any]:
+        """Alterar a configuração em tempo de execução"""
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if sample_rate is not None:
+            self.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+        if slow_threshold_ms is not None:
+            self.slow_threshold_ms = float(slow_threshold_ms)
+        return self.settings()
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "slow_threshold_ms": self.slow_threshold_ms
+        }
+
+    @property
+    def current(self) -> Optional[Trace]:
+        return getattr(self._local, "trace", None)
+
+    def start_trace(self, name: str, **attributes) -> Optional[Trace]:
+        """Iniciar o trace da requisição atual (se amostrada)"""
+        self._local.trace = None
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        self._local.trace = Trace(name, attributes)
+        return self._local.trace
+
+    def finish_trace(self, **attributes) -> Optional[Trace]:
+        """Encerrar o trace da requisição atual"""
+        trace = self.current
+        if trace is None:
+            return None
+        self._local.trace = None
+        trace.root.attributes.update(attributes)
+        # Spans deixados abertos por exceções são encerrados junto com a raiz
+        for span in reversed(trace.stack):
+            trace.close_span(span)
+
+        with self._lock:
+            self.recent.append(trace)
+            if trace.duration_ms >= self.slow_threshold_ms:
+                self.slow.append(trace)
+                logger.warning(f"Requisição lenta ({trace.duration_ms:.1f} ms): "
+                               f"{json.dumps(trace.to_dict(), default=str)}")
+        return trace
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Cronometrar um trecho dentro do trace atual (sem custo se inativo)"""
+        trace = self.current
+        if trace is None:
+            yield None
+            return
+        span = trace.open_span(name, attributes)
+        try:
+            yield span
+        except Exception as e:
+            span.error = str(e)
+            raise
+        finally:
+            trace.close_span(span)
+
+    @contextmanager
+    def task_span(self, name: str, **attributes):
+        """
+        Span para tarefas asyncio que rodam em paralelo.
+
+        A pilha do trace supõe spans aninhados; com corrotinas concorrentes
+        o pai vem de uma ContextVar, copiada para cada Task criada por
+        asyncio.gather, e cai no topo da pilha fora das tarefas.
+        """
+        trace = self.current
+        if trace is None:
+            yield None
+            return
+        parent_id = _task_parent.get()
+        if parent_id is None and trace.stack:
+            parent_id = trace.stack[-1].span_id
+        span = trace.add_span(name, parent_id, attributes)
+        token = _task_parent.set(span.span_id)
+        try:
+            yield span
+        except Exception as e:
+            span.error = str(e)
+            raise
+        finally:
+            _task_parent.reset(token)
+            span.end_ns = time.time_ns()
+
+    def traced(self, name: str):
+        """Decorador que envolve a função em um span"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def export(self, slow_only: bool = False, fmt: str = "json") -> Dict[str, Any]:
+        """Exportar os traces guardados em JSON ou OTLP/JSON"""
+        with self._lock:
+            traces = list(self.slow if slow_only else self.recent)
+        if fmt == "otlp":
+            spans = [span for trace in traces for span in trace.to_otlp()]
+            return {
+                "resourceSpans": [{
+                    "resource": {"attributes": [_otlp_attribute("service.name", "telegram-bot-manager")]},
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}]
+                }]
+            }
+        return {"settings": self.settings(), "traces": [trace.to_dict() for trace in traces]}
+
+
+class SamplingProfiler:
+    """
+    Profiler por amostragem que pode ser ligado em produção.
+
+    Uma thread de fundo lê periodicamente as pilhas de todas as threads
+    (sys._current_frames) e conta quantas vezes cada pilha aparece.
+    """
+
+    def __init__(self, max_depth: int = 64):
+        self.max_depth = max_depth
+        self.interval = 0.01
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.started_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms: float = 10.0) -> Dict[str, Any]:
+        """Iniciar a amostragem (zera as amostras anteriores)"""
+        with self._lock:
+            if self.running:
+                return self.status()
+            self.interval = max(1.0, float(interval_ms)) / 1000
+            self.samples = Counter()
+            self.sample_count = 0
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        """Parar a amostragem mantendo as amostras coletadas"""
+        with self._lock:
+            thread = self._thread
+            self._stop.set()
+        if thread is not None:
+            thread.join()
+        return self.status()
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                with self._lock:
+                    self.samples[";".join(reversed(stack))] += 1
+            with self._lock:
+                self.sample_count += 1
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "started_at": self.started_at,
+            "samples": self.sample_count
+        }
+
+    def report(self, limit: int = 50) -> Dict[str, Any]:
+        """Pilhas mais frequentes, no formato 'collapsed' dos flame graphs"""
+        with self._lock:
+            top = self.samples.most_common(limit)
+        return {
+            **self.status(),
+            "stacks": [{"stack": stack, "count": count} for stack, count in top]
+        }
+
+    def collapsed(self) -> str:
+        """Todas as pilhas no formato texto 'pilha contagem'"""
+        with self._lock:
+            return "\n".join(f"{stack} {count}" for stack, count in self.samples.items())
+
+
+tracer = Tracer(
+    enabled=os.environ.get('TRACING_ENABLED', 'False').lower() == 'true',
+    sample_rate=float(os.environ.get('TRACING_SAMPLE_RATE', 1.0)),
+    slow_threshold_ms=float(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', 1000)),
+    buffer_size=int(os.environ.get('TRACING_BUFFER_SIZE', 100))
+)
+
+profiler = SamplingProfiler()
@@ -0,0 +1,188 @@
+"""
+Testes dos anúncios fixados (debounce, agrupamento e remoção)
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Adicionar o diretório src ao path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import app as app_module
+from announcements import AnnouncementPublisher
+
+USER_ID = "usuario_teste"
+
+
+class FakeManager:
+    """Substitui o TelegramBotManager registrando as publicações"""
+
+    def __init__(self):
+        self.groups = {USER_ID: [{"id": -1}, {"id": -2}]}
+        self.syncs = []
+        self.unpinned = []
+        self.next_id = 100
+        self.block = None  # threading.Event para segurar a publicação
+        self.failing = {}  # group_id -> quantas publicações devem falhar
+
+    def sync_announcement(self, user_id, text, parse_mode, targets, pin=True):
+        if self.block is not None:
+            self.block.wait(2)
+        self.syncs.append((text, dict(targets)))
+        results = []
+        for group_id, message_id in targets.items():
+            if self.failing.get(group_id):
+                self.failing[group_id] -= 1
+                results.append({"group_id": group_id, "success": False, "error": "Flood control exceeded"})
+            elif message_id is None:
+                self.next_id += 1
+                results.append({"group_id": group_id, "success": True, "action": "sent", "message_id": self.next_id})
+            else:
+                results.append({"group_id": group_id, "success": True, "action": "edited", "message_id": message_id})
+        return {"success": True, "results": results}
+
+    def unpin_announcement(self, user_id, messages):
+        self.unpinned.append(dict(messages))
+        return {"success": True, "results": []}
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condição não atingida"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def manager():
+    return FakeManager()
+
+
+def test_first_publish_sends_then_edits(manager):
+    publisher = AnnouncementPublisher(manager, debounce=10)
+    result = publisher.update(USER_ID, "status", "v1", immediate=True)
+    assert result["status"] == "published"
+    assert result["groups"] == {
+        "-1": {"message_id": 101, "up_to_date": True},
+        "-2": {"message_id": 102, "up_to_date": True}
+    }
+
+    publisher.update(USER_ID, "status", "v2", immediate=True)
+    assert manager.syncs[-1] == ("v2", {"-1": 101, "-2": 102})
+    assert publisher.get(USER_ID, "status")["stats"]["edited"] == 2
+
+
+def test_rapid_updates_are_coalesced(manager):
+    publisher = AnnouncementPublisher(manager, debounce=0.05, max_delay=5)
+    for i in range(10):
+        assert publisher.update(USER_ID, "status", f"v{i}")["status"] == "scheduled"
+    wait_until(lambda: manager.syncs)
+    time.sleep(0.1)
+
+    assert [text for text, _ in manager.syncs] == ["v9"]
+    stats = publisher.get(USER_ID, "status")["stats"]
+    assert stats["updates"] == 10
+    assert stats["coalesced"] == 9
+
+
+def test_max_delay_forces_publication(manager):
+    publisher = AnnouncementPublisher(manager, debounce=0.2, max_delay=0.1)
+    started = time.monotonic()
+    while time.monotonic() - started < 0.4:
+        publisher.update(USER_ID, "status", f"v{time.monotonic()}")
+        time.sleep(0.02)
+    assert len(manager.syncs) >= 2
+
+
+def test_unchanged_content_is_not_republished(manager):
+    publisher = AnnouncementPublisher(manager, debounce=10)
+    publisher.update(USER_ID, "status", "v1", immediate=True)
+    publisher.update(USER_ID, "status", "v1", immediate=True)
+    assert len(manager.syncs) == 1
+
+
+def test_remove_unpins_messages(manager):
+    publisher = AnnouncementPublisher(manager, debounce=10)
+    publisher.update(USER_ID, "status", "v1", immediate=True)
+    assert publisher.remove(USER_ID, "status")["success"]
+    assert manager.unpinned == [{"-1": 101, "-2": 102}]
+    assert publisher.get(USER_ID, "status") is None
+    assert publisher.remove(USER_ID, "status") is None
+
+
+def test_remove_waits_for_running_flush(manager):
+    publisher = AnnouncementPublisher(manager, debounce=0.01)
+    manager.block = threading.Event()
+    publisher.update(USER_ID, "status", "v1")
+    # A publicação agendada já começou e está presa no Telegram
+    wait_until(lambda: publisher.announcements[(USER_ID, "status")].flush_lock.locked())
+
+    remover = threading.Thread(target=publisher.remove, args=(USER_ID, "status"))
+    remover.start()
+    time.sleep(0.05)
+    manager.block.set()
+    remover.join()
+
+    # As mensagens enviadas durante a remoção também são desafixadas
+    assert manager.unpinned == [{"-1": 101, "-2": 102}]
+
+
+def test_timer_after_remove_does_not_publish(manager):
+    publisher = AnnouncementPublisher(manager, debounce=10)
+    publisher.update(USER_ID, "status", "v1")
+    announcement = publisher.announcements[(USER_ID, "status")]
+    publisher.remove(USER_ID, "status")
+    # Simula um Timer que já tinha disparado antes do cancel()
+    publisher._flush(announcement)
+    assert manager.syncs == []
+
+
+def test_failed_groups_are_retried(manager):
+    publisher = AnnouncementPublisher(manager, debounce=10)
+    publisher.RETRY_BASE_DELAY = 0.01
+    manager.failing["-2"] = 2
+    publisher.update(USER_ID, "status", "v1", immediate=True)
+
+    wait_until(lambda: publisher.get(USER_ID, "status")["groups"]["-2"]["up_to_date"])
+    # Só o grupo que falhou é publicado de novo
+    assert [targets for _, targets in manager.syncs[1:]] == [{"-2": None}, {"-2": None}]
+    stats = publisher.get(USER_ID, "status")["stats"]
+    assert stats["failed"] == 2
+    assert stats["retries"] == 0
+
+
+def test_stale_timer_does_not_orphan_current_one(manager):
+    publisher = AnnouncementPublisher(manager, debounce=10)
+    publisher.update(USER_ID, "status", "v1")
+    announcement = publisher.announcements[(USER_ID, "status")]
+    current = announcement.timer
+    # Publicação de um Timer anterior que aguardava o lock
+    publisher._flush(announcement)
+    assert announcement.timer is current
+    assert announcement.pending
+
+    publisher.update(USER_ID, "status", "v2")
+    current.join(1)
+    assert not current.is_alive()
+    publisher.remove(USER_ID, "status", unpin=False)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module.bot_manager, "bots", {USER_ID: object()})
+    return app_module.app.test_client()
+
+
+def test_publish_rejects_invalid_group_ids(client):
+    response = client.post(f"/bot/{USER_ID}/announcements/status", json={"message": "v1", "group_ids": "-1001"})
+    assert response.status_code == 400
+
+
+def test_publish_requires_registered_bot(client):
+    response = client.post("/bot/outro/announcements/status", json={"message": "v1"})
+    assert response.status_code == 400
@@ -53,6 +53,14 @@ def test_api():
     print(f"Status: {response.status_code}")
     print(f"Resposta: {response.json()}")
     
+    # 3.1. Configurar grupos em lote
+    print("\n3.1. Configurando grupos em lote...")
+    response = requests.post(f"{BASE_URL}/bot/{USER_ID}/groups/bulk-create", json={
+        "chats": [GROUP_ID]
+    })
+    print(f"Status: {response.status_code}")
+    print(f"Resposta: {response.json()}")
+    
     # 4. Listar grupos
     print("\n4. Listando grupos...")
     response = requests.get(f"{BASE_URL}/bot/{USER_ID}/groups")
@@ -84,6 +92,18 @@ def test_api():
     print(f"Status: {response.status_code}")
     print(f"Resposta: {response.json()}")
     
+    # 6.1. Aplicar política de permissões
+    print("\n6.1. Aplicando política de permissões...")
+    response = requests.post(f"{BASE_URL}/bot/{USER_ID}/groups/policy", json={
+        "permissions": {
+            "can_send_messages": True,
+            "can_send_polls": False
+        },
+        "filter": {"group_ids": [GROUP_ID]}
+    })
+    print(f"Status: {response.status_code}")
+    print(f"Resposta: {response.json()}")
+    
     # 7. Enviar mensagem
     print("\n7. Enviando mensagem...")
     response = requests.post(f"{BASE_URL}/bot/{USER_ID}/group/{GROUP_ID}/send-message", json={
@@ -93,6 +113,22 @@ def test_api():
     print(f"Status: {response.status_code}")
     print(f"Resposta: {response.json()}")
     
+    # 7.1. Anúncio fixado (enviado e fixado, depois editado)
+    print("\n7.1. Publicando anúncio fixado...")
+    response = requests.post(f"{BASE_URL}/bot/{USER_ID}/announcements/teste", json={
+        "message": "📌 Status: tudo funcionando",
+        "group_ids": [GROUP_ID],
+        "immediate": True
+    })
+    print(f"Status: {response.status_code}")
+    print(f"Resposta: {response.json()}")
+    
+    response = requests.post(f"{BASE_URL}/bot/{USER_ID}/announcements/teste", json={
+        "message": "📌 Status: atualizado"
+    })
+    print(f"Status: {response.status_code}")
+    print(f"Resposta: {response.json()}")
+    
     # 8. Adicionar membros (exemplo - substitua pelos IDs reais)
     print("\n8. Testando adição de membros...")
     response = requests.post(f"{BASE_URL}/bot/{USER_ID}/group/{GROUP_ID}/members/add", json={
@@ -109,6 +145,12 @@ def test_api():
     print(f"Status: {response.status_code}")
     print(f"Resposta: {response.json()}")
     
+    # 10. Uso e cotas do usuário
+    print("\n10. Consultando uso do usuário...")
+    response = requests.get(f"{BASE_URL}/bot/{USER_ID}/usage")
+    print(f"Status: {response.status_code}")
+    print(f"Resposta: {response.json()}")
+    
     print("\n✅ Testes concluídos!")
 
 def test_with_real_data():
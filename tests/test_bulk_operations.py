@@ -0,0 +1,218 @@
+"""
+Testes das operações em lote do TelegramBotManager com um Bot falso
+"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Adicionar o diretório src ao path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from telegram import ChatPermissions
+from telegram.error import BadRequest, RetryAfter
+from telegram_bot_manager import TelegramBotManager, RateLimiter
+from tracing import tracer
+
+USER_ID = "usuario_teste"
+
+
+class FakeBot:
+    """Bot que responde em memória e registra as chamadas feitas"""
+
+    def __init__(self):
+        self.token = "123:fake"
+        self.calls = []
+        self.usernames = {"@alias": -100}
+        self.not_admin = set()
+        self.permissions = {}
+        self.failing = set()
+        self.flooded = set()
+
+    async def get_me(self):
+        self.calls.append(("get_me",))
+        return SimpleNamespace(id=999)
+
+    async def get_chat(self, chat_id):
+        self.calls.append(("get_chat", str(chat_id)))
+        if chat_id == "@missing":
+            raise BadRequest("Chat not found")
+        chat_id = self.usernames.get(chat_id, chat_id)
+        return SimpleNamespace(id=int(chat_id), title=f"Grupo {chat_id}", type="supergroup",
+                               description=None, invite_link=None, member_count=3,
+                               permissions=self.permissions.get(str(chat_id), ChatPermissions.all_permissions()))
+
+    async def set_chat_permissions(self, chat_id, permissions, use_independent_chat_permissions=None):
+        self.calls.append(("set_chat_permissions", chat_id, use_independent_chat_permissions))
+        if chat_id in self.flooded:
+            raise RetryAfter(0)
+        if chat_id in self.failing and not permissions.can_send_messages:
+            raise BadRequest("Not enough rights")
+        self.permissions[chat_id] = permissions
+        return True
+
+    async def get_chat_member(self, chat_id, user_id):
+        self.calls.append(("get_chat_member", str(chat_id)))
+        status = "member" if chat_id in self.not_admin else "administrator"
+        return SimpleNamespace(status=status, can_change_info=True, can_delete_messages=True,
+                               can_invite_users=True, can_restrict_members=True, can_pin_messages=True)
+
+
+@pytest.fixture
+def manager():
+    manager = TelegramBotManager(bulk_concurrency=4, rate_limit=1000, flood_retries=2)
+    manager.bots[USER_ID] = FakeBot()
+    manager.groups[USER_ID] = [{"id": -1, "title": "Grupo -1", "type": "supergroup"}]
+    return manager
+
+
+def test_bulk_create_groups(manager):
+    bot = manager.bots[USER_ID]
+    bot.not_admin.add(-7)
+
+    result = manager.bulk_create_groups(USER_ID, ["-1", "-2", "-2", "-7", "@missing", "@alias", "-100"])
+
+    statuses = [(r["chat"], r.get("status"), r["success"]) for r in result["results"]]
+    assert statuses == [
+        ("-1", "already_configured", True),
+        ("-2", "configured", True),
+        ("-7", None, False),
+        ("@missing", None, False),
+        ("@alias", "configured", True),
+        ("-100", "already_configured", True),
+    ]
+    assert result["configured"] == 2
+    assert result["failed"] == 2
+    assert [g["id"] for g in manager.groups[USER_ID]] == [-1, -2, -100]
+
+
+def test_bulk_create_skips_registered_ids_without_telegram_calls(manager):
+    bot = manager.bots[USER_ID]
+    result = manager.bulk_create_groups(USER_ID, ["-1"])
+    assert result["results"][0]["status"] == "already_configured"
+    assert bot.calls == []
+
+
+@pytest.fixture
+def fleet(manager):
+    manager.groups[USER_ID] = [
+        {"id": -i, "title": f"Loja {i}", "type": "supergroup"} for i in range(1, 5)
+    ]
+    return manager
+
+
+def statuses(result):
+    return {r["group_id"]: r["status"] for r in result["results"]}
+
+
+def test_policy_restrict_then_skip_known_state(fleet):
+    bot = fleet.bots[USER_ID]
+    result = fleet.apply_policy(USER_ID, {"action": "restrict", "filter": {"group_ids": [-1, -2]}})
+    assert statuses(result) == {"-1": "applied", "-2": "applied"}
+    assert not bot.permissions["-1"].can_send_messages
+    assert all(call[2] is True for call in bot.calls if call[0] == "set_chat_permissions")
+
+    bot.calls.clear()
+    result = fleet.apply_policy(USER_ID, {"action": "restrict", "filter": {"group_ids": [-1, -2]}})
+    assert statuses(result) == {"-1": "skipped", "-2": "skipped"}
+    assert bot.calls == []
+
+
+def test_policy_unrestrict_restores_previous_permissions(fleet):
+    bot = fleet.bots[USER_ID]
+    fleet.apply_policy(USER_ID, {"action": "restrict", "filter": {"title_contains": "loja 1"}})
+    result = fleet.apply_policy(USER_ID, {"action": "unrestrict", "filter": {"title_contains": "loja 1"}})
+    assert statuses(result) == {"-1": "applied"}
+    assert bot.permissions["-1"].can_change_info is True
+
+
+def test_policy_restores_granular_permissions(fleet):
+    bot = fleet.bots[USER_ID]
+    original = ChatPermissions(can_send_messages=True, can_send_photos=True, can_send_videos=False,
+                               can_manage_topics=True, can_invite_users=True)
+    bot.permissions["-1"] = original
+    fleet.apply_policy(USER_ID, {"action": "restrict", "filter": {"group_ids": [-1]}})
+    assert bot.permissions["-1"].can_manage_topics is True
+    result = fleet.apply_policy(USER_ID, {"action": "unrestrict", "filter": {"group_ids": [-1]}})
+    assert statuses(result) == {"-1": "applied"}
+    restored = bot.permissions["-1"]
+    assert restored.can_send_photos is True
+    assert restored.can_send_videos is False
+    assert restored.can_manage_topics is True
+    assert restored.can_invite_users is True
+
+
+def test_policy_unrestrict_without_lock_is_skipped(fleet):
+    bot = fleet.bots[USER_ID]
+    result = fleet.apply_policy(USER_ID, {"action": "unrestrict", "filter": {"group_ids": [-1]}})
+    assert statuses(result) == {"-1": "skipped"}
+    assert "error" in result["results"][0]
+    assert bot.calls == []
+
+
+def test_policy_restrict_without_snapshot_does_not_lock(fleet):
+    bot = fleet.bots[USER_ID]
+    bot.permissions["-2"] = None
+    result = fleet.apply_policy(USER_ID, {"action": "restrict", "filter": {"group_ids": [-2]}})
+    assert statuses(result) == {"-2": "applied"}
+    assert "-2" not in fleet.locked_permissions[USER_ID]
+    result = fleet.apply_policy(USER_ID, {"action": "unrestrict", "filter": {"group_ids": [-2]}})
+    assert statuses(result) == {"-2": "skipped"}
+
+
+def test_policy_rolls_back_on_failure(fleet):
+    bot = fleet.bots[USER_ID]
+    bot.failing.add("-3")
+    result = fleet.apply_policy(USER_ID, {"action": "restrict"})
+    assert statuses(result) == {"-1": "rolled_back", "-2": "rolled_back", "-3": "failed", "-4": "rolled_back"}
+    assert result["failed"] == 1
+    assert all(bot.permissions[g].can_send_messages for g in ("-1", "-2", "-4"))
+
+
+def test_policy_flood_limit_does_not_trigger_rollback(fleet):
+    bot = fleet.bots[USER_ID]
+    bot.flooded.add("-3")
+    result = fleet.apply_policy(USER_ID, {"action": "restrict"})
+    assert statuses(result) == {"-1": "applied", "-2": "applied", "-3": "rate_limited", "-4": "applied"}
+    # Uma tentativa mais flood_retries repetições
+    assert sum(1 for call in bot.calls if call[:2] == ("set_chat_permissions", "-3")) == 3
+    assert not bot.permissions["-1"].can_send_messages
+
+
+def test_each_telegram_call_gets_its_own_span(fleet, monkeypatch):
+    monkeypatch.setattr(tracer, "enabled", True)
+    monkeypatch.setattr(tracer, "sample_rate", 1.0)
+    fleet.bots[USER_ID].flooded.add("-3")
+    tracer.start_trace("POST /policy")
+    fleet.apply_policy(USER_ID, {"action": "restrict"})
+    trace = tracer.finish_trace()
+
+    by_name = {}
+    for span in trace.spans:
+        by_name.setdefault(span.name, []).append(span)
+    (bulk,) = by_name["telegram._apply_permissions"]
+    calls = by_name["telegram.get_chat"] + by_name["telegram.set_chat_permissions"]
+    assert len(by_name["telegram.get_chat"]) == 4
+    # Tarefas concorrentes são filhas do span do lote, não umas das outras
+    assert all(span.parent_id == bulk.span_id for span in calls)
+    assert all(span.end_ns >= span.start_ns for span in calls)
+    flooded = [span for span in by_name["telegram.set_chat_permissions"] if span.attributes["chat_id"] == "-3"]
+    assert flooded[0].attributes["flood_retries"] == 2
+    assert flooded[0].error is not None
+    assert "rate_limit_wait_ms" in flooded[0].attributes
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(rate=10, burst=1)
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == pytest.approx(0.1, abs=0.01)
+    assert limiter.reserve() == pytest.approx(0.2, abs=0.01)
+
+
+def test_rate_limiter_pause():
+    limiter = RateLimiter(rate=1000, burst=10)
+    limiter.pause(5)
+    assert limiter.reserve() == pytest.approx(5, abs=0.05)
@@ -0,0 +1,115 @@
+"""
+Testes da serialização, compressão e ETags das respostas
+"""
+
+import gzip
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Adicionar o diretório src ao path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import serialization
+from serialization import dumps, parse_fields, select_fields, make_etag, compress
+from telegram_bot_manager import TelegramBotManager
+
+BODY = b'{"groups":[]}' * 200
+
+
+def test_dumps_is_compact_json():
+    assert json.loads(dumps({"id": 1, "title": "Grupo"})) == {"id": 1, "title": "Grupo"}
+    assert b" " not in dumps({"a": [1, 2]})
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields(" , ") is None
+    assert parse_fields("id, title") == ["id", "title"]
+
+
+def test_select_fields():
+    result = {
+        "success": True,
+        "groups": [{"id": 1, "title": "a", "type": "group"}],
+        "group": {"id": 1, "title": "a", "type": "group"}
+    }
+    selected = select_fields(result, ["id", "title", "inexistente"])
+    assert selected["groups"] == [{"id": 1, "title": "a"}]
+    assert selected["group"] == {"id": 1, "title": "a"}
+    assert selected["success"] is True
+    assert select_fields(result, None) is result
+
+
+def test_make_etag():
+    assert make_etag("v1", ["id"]) == make_etag("v1", ["id"])
+    assert make_etag("v1", ["id"]) != make_etag("v2", ["id"])
+    assert make_etag("v1", None) != make_etag("v1", ["id"])
+
+
+@pytest.fixture
+def without_brotli(monkeypatch):
+    monkeypatch.setattr(serialization, "brotli", None)
+
+
+def test_compress_gzip(without_brotli):
+    body, encoding = compress(BODY, "gzip, deflate", 100)
+    assert encoding == "gzip"
+    assert gzip.decompress(body) == BODY
+
+
+@pytest.mark.parametrize("accept_encoding", ["gzip;q=0", "gzip; q=0.0, deflate", "", "identity", "*;q=0"])
+def test_compress_respects_unacceptable_codings(without_brotli, accept_encoding):
+    assert compress(BODY, accept_encoding, 100) == (BODY, None)
+
+
+def test_compress_wildcard(without_brotli):
+    assert compress(BODY, "*", 100)[1] == "gzip"
+    assert compress(BODY, "*, gzip;q=0", 100)[1] is None
+
+
+def test_compress_small_body_untouched():
+    assert compress(b"{}", "gzip", 100) == (b"{}", None)
+
+
+def test_groups_version_is_unique_across_threads():
+    manager = TelegramBotManager()
+    seen = []
+    lock = threading.Lock()
+
+    def touch():
+        for _ in range(500):
+            manager._touch_groups("u")
+            with lock:
+                seen.append(manager.groups_versions["u"])
+
+    threads = [threading.Thread(target=touch) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(seen)) == len(seen)
+
+
+def test_list_groups_etag_and_fields():
+    import app as app_module
+
+    client = app_module.app.test_client()
+    manager = app_module.bot_manager
+    manager.groups["etag_user"] = [{"id": -1, "title": "a", "type": "group"}]
+    manager._touch_groups("etag_user")
+
+    response = client.get("/bot/etag_user/groups?fields=id")
+    assert response.get_json()["groups"] == [{"id": -1}]
+    etag = response.headers["ETag"]
+
+    response = client.get("/bot/etag_user/groups?fields=id", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    manager._touch_groups("etag_user")
+    response = client.get("/bot/etag_user/groups?fields=id", headers={"If-None-Match": etag})
+    assert response.status_code == 200
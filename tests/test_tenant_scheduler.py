@@ -0,0 +1,141 @@
+"""
+Testes do escalonador justo entre usuários
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Adicionar o diretório src ao path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from tenant_scheduler import TenantScheduler, QuotaExceeded, parse_weights
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condição não atingida"
+        time.sleep(0.001)
+
+
+def test_parse_weights():
+    assert parse_weights("a:2, b:0.5,,") == {"a": 2.0, "b": 0.5}
+
+
+@pytest.mark.parametrize("raw", ["a:0", "a:-1"])
+def test_parse_weights_rejects_non_positive(raw):
+    with pytest.raises(ValueError):
+        parse_weights(raw)
+
+
+def test_constructor_rejects_invalid_config():
+    with pytest.raises(ValueError):
+        TenantScheduler(weights={"a": 0})
+    with pytest.raises(ValueError):
+        TenantScheduler(max_workers=0)
+
+
+def test_rate_limit_rejects_with_retry_after():
+    scheduler = TenantScheduler(rate_limit=1, burst=2)
+    for _ in range(2):
+        with scheduler.slot("a"):
+            pass
+    with pytest.raises(QuotaExceeded) as excinfo:
+        scheduler.acquire("a")
+    assert 0 < excinfo.value.retry_after <= 1
+    assert scheduler.usage("a")["rejected"]["rate_limit"] == 1
+
+
+def test_zero_rate_limit_is_unlimited():
+    scheduler = TenantScheduler(rate_limit=0, burst=1)
+    for _ in range(50):
+        with scheduler.slot("a"):
+            pass
+    assert scheduler.usage("a")["completed"] == 50
+
+
+def test_queue_full_is_rejected():
+    scheduler = TenantScheduler(tenant_concurrency=1, max_queue=1, rate_limit=0)
+    scheduler.acquire("a")
+    queued = threading.Thread(target=lambda: (scheduler.acquire("a"), scheduler.release("a")))
+    queued.start()
+    wait_until(lambda: len(scheduler.tenants["a"].waiters) == 1)
+    with pytest.raises(QuotaExceeded):
+        scheduler.acquire("a")
+    scheduler.release("a")
+    queued.join()
+    assert scheduler.usage("a")["rejected"]["queue_full"] == 1
+
+
+def test_weighted_fair_order():
+    scheduler = TenantScheduler(max_workers=1, tenant_concurrency=1, rate_limit=0, weights={"a": 3})
+    scheduler.acquire("x")
+    order = []
+
+    def worker(user_id):
+        with scheduler.slot(user_id):
+            order.append(user_id)
+
+    threads = []
+    for user_id in ["a"] * 6 + ["b"] * 6:
+        thread = threading.Thread(target=worker, args=(user_id,))
+        thread.start()
+        threads.append(thread)
+        # Garantir a ordem de chegada na fila
+        wait_until(lambda: sum(len(t.waiters) for t in scheduler.tenants.values()) == len(threads))
+    scheduler.release("x")
+    for thread in threads:
+        thread.join()
+
+    assert order == ["a", "a", "a", "b", "a", "a", "a", "b", "b", "b", "b", "b"]
+
+
+def test_usage_does_not_create_state():
+    scheduler = TenantScheduler()
+    usage = scheduler.usage("desconhecido")
+    assert usage["admitted"] == 0
+    assert "desconhecido" not in scheduler.tenants
+
+
+def test_idle_tenants_are_evicted():
+    scheduler = TenantScheduler(rate_limit=1000, burst=1)
+    scheduler.SWEEP_INTERVAL = 0
+    with scheduler.slot("a"):
+        pass
+    time.sleep(0.01)
+    with scheduler.slot("b"):
+        assert "a" not in scheduler.tenants
+        assert "b" in scheduler.tenants
+
+
+def test_usage_counters_survive_eviction():
+    scheduler = TenantScheduler(rate_limit=1000, burst=1)
+    scheduler.SWEEP_INTERVAL = 0
+    scheduler.acquire("a")
+    with pytest.raises(QuotaExceeded):
+        scheduler.acquire("a")
+    scheduler.release("a")
+    time.sleep(0.01)
+    with scheduler.slot("b"):
+        assert "a" not in scheduler.tenants
+    usage = scheduler.usage("a")
+    assert usage["completed"] == 1
+    assert usage["rejected"]["rate_limit"] == 1
+    assert "a" in [tenant["user_id"] for tenant in scheduler.usage_all()["tenants"]]
+
+
+def test_usage_counters_expire_after_ttl():
+    scheduler = TenantScheduler(rate_limit=1000, burst=1, usage_ttl=0)
+    scheduler.SWEEP_INTERVAL = 0
+    with scheduler.slot("a"):
+        pass
+    time.sleep(0.01)
+    with scheduler.slot("b"):
+        pass
+    assert "a" not in scheduler.usage_stats
+    assert scheduler.usage("a")["completed"] == 0
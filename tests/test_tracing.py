@@ -0,0 +1,61 @@
+"""
+Testes do tracing e da proteção dos endpoints de diagnóstico
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Adicionar o diretório src ao path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import app as app_module
+from tracing import Tracer
+
+
+def test_spans_are_nested_and_exported():
+    tracer = Tracer(enabled=True, slow_threshold_ms=0)
+    tracer.start_trace("GET /teste")
+    with tracer.span("manager.list_groups"):
+        with tracer.span("telegram.get_chat", chat="-1"):
+            pass
+    trace = tracer.finish_trace(**{"http.status_code": 200})
+
+    root, manager, telegram = trace.spans
+    assert manager.parent_id == root.span_id
+    assert telegram.parent_id == manager.span_id
+    assert tracer.export(slow_only=True)["traces"][0]["trace_id"] == trace.trace_id
+
+    otlp = tracer.export(fmt="otlp")["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [span["name"] for span in otlp] == ["GET /teste", "manager.list_groups", "telegram.get_chat"]
+    assert "parentSpanId" not in otlp[0]
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer(enabled=False)
+    assert tracer.start_trace("GET /teste") is None
+    with tracer.span("nada") as span:
+        assert span is None
+    assert tracer.finish_trace() is None
+    assert tracer.export()["traces"] == []
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def test_debug_endpoints_disabled_without_token(client, monkeypatch):
+    monkeypatch.setattr(app_module, "DEBUG_API_TOKEN", "")
+    assert client.get("/debug/traces").status_code == 404
+    assert client.post("/debug/profiler/start").status_code == 404
+    assert client.put("/debug/tracing", json={"slow_threshold_ms": 0}).status_code == 404
+
+
+def test_debug_endpoints_require_token(client, monkeypatch):
+    monkeypatch.setattr(app_module, "DEBUG_API_TOKEN", "segredo")
+    assert client.get("/debug/tracing").status_code == 403
+    assert client.get("/debug/tracing", headers={"X-Debug-Token": "errado"}).status_code == 403
+    assert client.get("/debug/tracing", headers={"X-Debug-Token": "segredo"}).status_code == 200